@@ -0,0 +1,45 @@
+"""Add price path to company
+
+Revision ID: 3f9c1a7d2b64
+Revises: 88e2f5a736d0
+Create Date: 2026-10-17 10:12:03.418112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1a7d2b64'
+down_revision: Union[str, None] = '88e2f5a736d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('companies', sa.Column('price_path', postgresql.ARRAY(sa.Integer()), nullable=True))
+
+    # Backfill from existing events
+    conn = op.get_bind()
+    companies = conn.execute(sa.text("SELECT id, price FROM companies")).all()
+    events = conn.execute(sa.text("SELECT company_id, price FROM events ORDER BY company_id, day")).all()
+    changes = {}
+    for company_id, price in events:
+        changes.setdefault(company_id, []).append(price)
+    for company_id, price in companies:
+        curr = price
+        path = [curr]
+        for change in changes.get(company_id, []):
+            curr += int(curr * change / 100)
+            path.append(curr)
+        conn.execute(
+            sa.text("UPDATE companies SET price_path = :path WHERE id = :id"),
+            {"path": path, "id": company_id},
+        )
+
+
+def downgrade() -> None:
+    op.drop_column('companies', 'price_path')
@@ -0,0 +1,45 @@
+"""Add positions table
+
+Revision ID: a81d4e6c05f2
+Revises: 3f9c1a7d2b64
+Create Date: 2026-10-17 11:02:47.901235
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81d4e6c05f2'
+down_revision: Union[str, None] = '3f9c1a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('positions',
+    sa.Column('game_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('game_id', 'user_id', 'company_id')
+    )
+    # Backfill from existing trades
+    op.execute(
+        """
+        INSERT INTO positions (game_id, user_id, company_id, amount)
+        SELECT game_id, user_id, company_id, SUM(amount)
+        FROM trades
+        WHERE game_id IS NOT NULL
+        GROUP BY game_id, user_id, company_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('positions')
@@ -1,69 +1,191 @@
 from datetime import datetime, timedelta
-from pytz import utc
-from typing import Annotated, Union, List
+from typing import Annotated, Callable, List, Optional, Tuple, TypeVar, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Cookie
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Cookie, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.game_service import GameService, GameException
-from core.entities.schema.db import get_db
+from app.services.market_feed import MarketFeed
+from app.services.game_cache import GameCache, make_etag
+from app.services.game_pool import GamePool
+from app.services.leaderboard import leaderboard
+from app.services.market_scheduler import MarketScheduler
+from app.services.trade_batcher import BatchAbortedException, TradeBatcher, TradeRejectedException
+from core.entities.schema.db import get_db, get_async_db, AsyncSessionLocal, SessionLocal
 from core.entities.schema.game import (
-    create_game,
     get_game_by_id,
     get_user_by_id,
-    get_last_game,
     get_all_games,
 )
-from core.entities.schema.game import create_trades
-from core.entities.dto.game import GameDTO, CreateGameDTO
-from core.entities.dto.game import CreateTradeDTO, HoldingsDTO, GameResultDTO
+from core.entities.schema.game import (
+    create_game_async,
+    get_game_by_id_async,
+    get_game_summaries_async,
+    get_game_version_async,
+    get_user_by_id_async,
+    get_last_game_async,
+)
+from core.entities.schema.game import Game, Trade, create_trades, get_game_results, get_stored_ranking
+from core.entities.schema.game import save_game_results, settle_game
+from core.entities.dto.game import GameDTO, CreateGameDTO, GameSummaryDTO
+from core.entities.dto.game import CreateTradeDTO, HoldingsDTO, GameResultDTO, GameRankDTO
 from core.entities.dto.convert import game_to_dto
+from core.utils.clock import MarketClock, get_market_clock
+from core.config import config
 
 game_router = APIRouter(prefix="/game")
 
 game_service = GameService()
+market_feed = MarketFeed()
+game_cache = GameCache(config.game_cache_size)
+game_pool = GamePool(
+    game_service,
+    size=config.game_pool_size,
+    languages=config.game_pool_languages,
+    themes=config.game_pool_themes,
+    interval=config.game_pool_interval,
+)
+market_scheduler = MarketScheduler(AsyncSessionLocal, interval=config.market_scheduler_interval)
+trade_batcher: Optional[TradeBatcher] = None
+if config.trade_batch_window > 0:
+    trade_batcher = TradeBatcher(
+        game_service,
+        SessionLocal,
+        window=config.trade_batch_window,
+        max_size=config.trade_batch_max_size,
+    )
+
+# Seconds between keep-alive comments on idle feeds
+FEED_KEEPALIVE = 15
+
+# Attempts at a transaction losing races on the user's version to concurrent ones
+CONFLICT_RETRIES = 5
+
+T = TypeVar("T")
+
+# Handlers awaiting on the event loop use AsyncSession. The ones working on the
+# lazily loaded aggregate are plain functions, which FastAPI runs in a thread pool.
 
 
 @game_router.post("/")
 async def post_new_game(
-    req: CreateGameDTO, db: Session = Depends(get_db), user_id: Annotated[Union[int, None], Cookie()] = None
+    req: CreateGameDTO,
+    db: AsyncSession = Depends(get_async_db),
+    clock: MarketClock = Depends(get_market_clock),
+    user_id: Annotated[Union[int, None], Cookie()] = None,
 ) -> GameDTO:
     if user_id is None:
         raise HTTPException(401, "Not signed in")
-    user = get_user_by_id(db, user_id)
+    user = await get_user_by_id_async(db, user_id)
     if user is None:
         raise HTTPException(401, "Not signed in")
 
-    game = get_last_game(db)
-    if game is not None and datetime.now(utc) - game.created_at < timedelta(minutes=2):
+    game = await get_last_game_async(db)
+    if game is not None and clock.now - game.created_at < timedelta(minutes=2):
         raise HTTPException(400, "New Game can be only created per minute")
 
-    companies, theme = await game_service.get_companies(theme=req.theme, language=req.language)
-    await game_service.create_new_events(companies, language=req.language)
-    game = create_game(db, theme, user, companies, req.language)
-
-    game.users.append(user)
-    db.commit()
-    return game_to_dto(game)
+    game = await game_pool.claim(db, user, req.language, req.theme)
+    if game is None:
+        companies, theme = await game_service.create_game_content(theme=req.theme, language=req.language)
+        game = await create_game_async(db, theme, user, companies, req.language)
+    return game_to_dto(game, clock)
 
 
 @game_router.get("/")
-def get_games(language: str, db=Depends(get_db)) -> List[GameDTO]:
+def get_games(language: str, db=Depends(get_db), clock: MarketClock = Depends(get_market_clock)) -> List[GameDTO]:
     games = get_all_games(db, language)
-    return [game_to_dto(game) for game in games]
-
-
-@game_router.get("/{id}")
-async def get_game(id: int, db=Depends(get_db)) -> GameDTO:
-    game = get_game_by_id(db, id)
-    if game is None:
+    return [game_to_dto(game, clock) for game in games]
+
+
+# Declared before /{id}, which would match it otherwise
+@game_router.get("/summary")
+async def get_game_summaries(
+    language: str,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+) -> List[GameSummaryDTO]:
+    """Lobby page of unstarted games. The next page starts before the created_at and id of the last one."""
+    if (before is None) != (before_id is None):
+        raise HTTPException(400, "before and before_id go together")
+    cursor = (before, before_id) if before is not None and before_id is not None else None
+    rows = await get_game_summaries_async(db, language, limit, cursor)
+    return [GameSummaryDTO(**row._mapping) for row in rows]
+
+
+@game_router.get("/{id}", response_model=GameDTO)
+async def get_game(
+    id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    clock: MarketClock = Depends(get_market_clock),
+) -> Response:
+    state = await get_game_version_async(db, id)
+    if state is None:
         raise HTTPException(404, "Game not found")
-    return game_to_dto(game)
+    version, last_trade, started_at = state
+
+    key = (id, clock.visible_day(started_at), version, last_trade)
+    etag = make_etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    body = game_cache.get(key)
+    if body is None:
+        game = await get_game_by_id_async(db, id)
+        if game is None:
+            raise HTTPException(404, "Game not found")
+        body = game_to_dto(game, clock).model_dump_json().encode("utf-8")
+        game_cache.put(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@game_router.get("/{id}/feed")
+async def get_game_feed(id: int, clock: MarketClock = Depends(get_market_clock)) -> StreamingResponse:
+    # Session is closed before streaming, so subscribers do not hold connections. The
+    # checks stay within it, as the clock resolves Company.game from its identity map.
+    async with AsyncSessionLocal() as db:
+        game = await get_game_by_id_async(db, id, profile="trade")
+        if game is None:
+            raise HTTPException(404, f"Game with id {id} not found")
+        if not game.started:
+            raise HTTPException(400, "Game is not started yet")
+        if game.is_closed(clock):
+            raise HTTPException(400, "Game is already closed")
+
+    async def stream():
+        async with market_feed.subscribe(game) as queue:
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), FEED_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if data is None:
+                    break
+                yield data
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @game_router.put("/{id}/start")
-async def start_game(
-    id: int, db: Session = Depends(get_db), user_id: Annotated[Union[int, None], Cookie()] = None
+def start_game(
+    id: int,
+    db: Session = Depends(get_db),
+    clock: MarketClock = Depends(get_market_clock),
+    user_id: Annotated[Union[int, None], Cookie()] = None,
 ) -> GameDTO:
     if user_id is None:
         raise HTTPException(401, "Not signed in")
@@ -80,12 +202,16 @@ async def start_game(
 
     game_service.start_game(game)
     db.commit()
-    return game_to_dto(game)
+    market_scheduler.schedule(game.id, game.started_at)
+    return game_to_dto(game, clock)
 
 
 @game_router.put("/{id}/join")
-async def join_game(
-    id: int, db: Session = Depends(get_db), user_id: Annotated[Union[int, None], Cookie()] = None
+def join_game(
+    id: int,
+    db: Session = Depends(get_db),
+    clock: MarketClock = Depends(get_market_clock),
+    user_id: Annotated[Union[int, None], Cookie()] = None,
 ) -> GameDTO:
     if user_id is None:
         raise HTTPException(401, "Not signed in")
@@ -94,7 +220,7 @@ async def join_game(
         raise HTTPException(401, "Not signed in")
 
     game = get_game_by_id(db, id)
-    if game is None:
+    if game is None or game.pool_key is not None:
         raise HTTPException(404, f"Game with id {id} not found")
     if game.started_at is not None:
         raise HTTPException(403, "Cannot join started game")
@@ -103,13 +229,17 @@ async def join_game(
         game.users.append(user)
         if game.owner_id is None:
             game.owner_id = user.id
+        game.bump_version()
         db.commit()
-    return game_to_dto(game)
+    return game_to_dto(game, clock)
 
 
 @game_router.delete("/{id}/leave")
-async def leave_game(
-    id: int, db: Session = Depends(get_db), user_id: Annotated[Union[int, None], Cookie()] = None
+def leave_game(
+    id: int,
+    db: Session = Depends(get_db),
+    clock: MarketClock = Depends(get_market_clock),
+    user_id: Annotated[Union[int, None], Cookie()] = None,
 ) -> GameDTO:
     if user_id is None:
         raise HTTPException(401, "Not signed in")
@@ -129,74 +259,188 @@ async def leave_game(
     if game.owner_id == user.id:
         if len(game.users) > 0:
             game.owner_id = game.users[0].id
+    game.bump_version()
 
     db.commit()
-    return game_to_dto(game)
+    return game_to_dto(game, clock)
 
 
 @game_router.post("/{id}/trade")
-async def make_trade(
-    id: int, req: CreateTradeDTO, db: Session = Depends(get_db), user_id: Annotated[Union[int, None], Cookie()] = None
+def make_trade(
+    id: int,
+    req: CreateTradeDTO,
+    db: Session = Depends(get_db),
+    clock: MarketClock = Depends(get_market_clock),
+    user_id: Annotated[Union[int, None], Cookie()] = None,
 ) -> HoldingsDTO:
     if user_id is None:
         raise HTTPException(401, "Not signed in")
+
+    holdings, trades = submit_trades(db, id, user_id, req, clock)
+    market_feed.publish_trades(id, trades)
+    return holdings
+
+
+def submit_trades(
+    db: Session,
+    id: int,
+    user_id: int,
+    req: CreateTradeDTO,
+    clock: MarketClock,
+) -> Tuple[HoldingsDTO, List[Trade]]:
+    if trade_batcher is not None:
+        try:
+            return trade_batcher.submit(id, user_id, req.trades, clock)
+        except TradeRejectedException as e:
+            raise HTTPException(e.status, str(e))
+        except BatchAbortedException:
+            # Done again in a transaction of its own, on state read afresh
+            pass
+    return retry_on_conflict(db, lambda: execute_trades(db, id, user_id, req, clock))
+
+
+def retry_on_conflict(db: Session, fn: Callable[[], T]) -> T:
+    """Runs a transaction again from scratch when a concurrent one updated the same user first"""
+    for _ in range(CONFLICT_RETRIES):
+        try:
+            return fn()
+        except StaleDataError:
+            db.rollback()
+    raise HTTPException(409, "Too many concurrent updates, try again")
+
+
+def execute_trades(
+    db: Session,
+    id: int,
+    user_id: int,
+    req: CreateTradeDTO,
+    clock: MarketClock,
+) -> Tuple[HoldingsDTO, List[Trade]]:
     user = get_user_by_id(db, user_id)
     if user is None:
         raise HTTPException(401, "Not signed in")
 
-    game = get_game_by_id(db, id)
+    game = get_game_by_id(db, id, profile="trade")
     if game is None:
         raise HTTPException(404, f"Game with id {id} not found")
     if game.started_at is None or user_id not in [u.id for u in game.users]:
         raise HTTPException(403, "Not allowed to make trade in this game")
 
-    if datetime.now(utc) - game.started_at > timedelta(minutes=2 * 8):
+    if not game.is_market_open(clock):
         raise HTTPException(403, "Market closed")
 
     try:
-        trades = game_service.perform_trades(user, game, req.trades)
+        trades = game_service.perform_trades(user, game, req.trades, clock)
     except GameException as e:
-        raise HTTPException(400, e)
-    trades = create_trades(db, trades)
+        raise HTTPException(400, str(e))
+    # The user row is updated even when the gold nets out, so its version guards the holdings too
+    flag_modified(user, "gold")
+    trades = create_trades(db, trades, game)
 
-    db.refresh(game)
-    return HoldingsDTO(
-        holdings=game.get_holdings(user),
-        gold=user.gold,
-    )
+    return HoldingsDTO(holdings=game.get_holdings(user), gold=user.gold), trades
 
 
 @game_router.get("/{id}/result")
-async def get_result(id: int, db: Session = Depends(get_db)) -> GameResultDTO:
+def get_result(id: int, db: Session = Depends(get_db), clock: MarketClock = Depends(get_market_clock)) -> GameResultDTO:
+    stored = get_game_results(db, id)
+    if stored is not None:
+        return GameResultDTO(result=stored)
+
     game = get_game_by_id(db, id)
     if game is None:
         raise HTTPException(404, f"Game with id {id} not found")
-    if not game.closed:
+    if not game.is_closed(clock):
         raise HTTPException(400, "Game is not closed yet")
 
-    result = game_service.get_game_result(game)
+    # The outcome never changes once closed, the first reader stores it unless the closer did
+    result = game_service.get_game_result(game, clock)
+    if not save_game_results(db, id, result):
+        result = get_game_results(db, id) or result
 
     return GameResultDTO(result=result)
 
 
-@game_router.put("/{id}/throw")
-async def throw_all_stocks(
-    id: int, db: Session = Depends(get_db), user_id: Annotated[Union[int, None], Cookie()] = None
-) -> GameDTO:
+def close_game(id: int):
+    """Stores the final results of a game that just closed"""
+    with SessionLocal() as db:
+        if get_game_results(db, id) is not None:
+            return
+        game = get_game_by_id(db, id)
+        if game is not None:
+            save_game_results(db, id, game_service.get_game_result(game, MarketClock()))
+
+
+def close_market(id: int):
+    """Sells the positions left once trading stopped, MARKET_HOURS after the start"""
+    with SessionLocal() as db:
+        if settle_game(db, id):
+            # Gold was updated in SQL, out of sight of the leaderboard. Only the board of
+            # this worker is invalidated, the others see it once reloaded after their ttl.
+            leaderboard.invalidate()
+
+
+async def on_game_closed(id: int):
+    await asyncio.to_thread(close_game, id)
+
+
+async def on_market_closed(id: int):
+    await asyncio.to_thread(close_market, id)
+
+
+market_scheduler.on_close(on_game_closed)
+market_scheduler.on_market_close(on_market_closed)
+
+
+@game_router.get("/{id}/ranking")
+def get_game_ranking(
+    id: int, db: Session = Depends(get_db), clock: MarketClock = Depends(get_market_clock)
+) -> List[GameRankDTO]:
+    # Closed games are ranked from their stored results, in the order of their index
+    stored = get_stored_ranking(db, id)
+    if stored is not None:
+        return [
+            GameRankDTO(rank=i + 1, id=r.user_id, nickname=r.nickname, profit=r.profit) for i, r in enumerate(stored)
+        ]
+
     game = get_game_by_id(db, id)
     if game is None:
         raise HTTPException(404, f"Game with id {id} not found")
-    if not game.closed:
-        raise HTTPException(400, "Game is not closed yet")
 
-    if user_id is None:
-        raise HTTPException(401, "Not signed in")
+    # Running games: profit at the current prices, only over the trades and positions of this game
+    result = game_service.get_game_result(game, clock)
+    users = sorted(game.users, key=lambda u: (-result[u.id], u.id))
+    return [GameRankDTO(rank=i + 1, id=u.id, nickname=u.nickname, profit=result[u.id]) for i, u in enumerate(users)]
 
-    user = get_user_by_id(db, user_id)
-    if user is None:
-        raise HTTPException(404, f"User {user_id} not found")
 
-    game_service.throws_all_stocks(game, user)
-    db.commit()
-    db.refresh(game)
-    return game_to_dto(game)
+@game_router.put("/{id}/throw")
+def throw_all_stocks(
+    id: int,
+    db: Session = Depends(get_db),
+    clock: MarketClock = Depends(get_market_clock),
+    user_id: Annotated[Union[int, None], Cookie()] = None,
+) -> GameDTO:
+    def throw() -> Tuple[Game, List[Trade]]:
+        game = get_game_by_id(db, id)
+        if game is None:
+            raise HTTPException(404, f"Game with id {id} not found")
+        if not game.is_closed(clock):
+            raise HTTPException(400, "Game is not closed yet")
+
+        if user_id is None:
+            raise HTTPException(401, "Not signed in")
+
+        user = get_user_by_id(db, user_id)
+        if user is None:
+            raise HTTPException(404, f"User {user_id} not found")
+        if game.settled_at is not None:
+            # Every position was sold at close already
+            return game, []
+
+        trades = game_service.throws_all_stocks(game, user, clock)
+        create_trades(db, trades, game)
+        return game, trades
+
+    game, trades = retry_on_conflict(db, throw)
+    if trades:
+        market_feed.publish_trades(game.id, trades)
+    return game_to_dto(game, clock)
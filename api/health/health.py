@@ -1,5 +1,9 @@
+from typing import Any, Dict
+
 from fastapi import APIRouter, Response
 
+from api.game.game import game_pool, game_service, market_scheduler, trade_batcher
+
 
 health_router = APIRouter(prefix="/health")
 
@@ -7,3 +11,27 @@ health_router = APIRouter(prefix="/health")
 @health_router.get("/")
 async def health():
     return Response(status_code=200)
+
+
+@health_router.get("/pool")
+async def pool_stats() -> Dict[str, Any]:
+    return game_pool.stats()
+
+
+@health_router.get("/llm-cache")
+async def llm_cache_stats() -> Dict[str, Any]:
+    if game_service.llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **game_service.llm_cache.stats()}
+
+
+@health_router.get("/trades")
+async def trade_batch_stats() -> Dict[str, Any]:
+    if trade_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **trade_batcher.stats()}
+
+
+@health_router.get("/scheduler")
+async def scheduler_stats() -> Dict[str, Any]:
+    return market_scheduler.stats()
@@ -1,22 +1,27 @@
-from typing import Annotated, Union, List
+from datetime import datetime
+from typing import Annotated, Optional, Union, List
 
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Response, Query
 from fastapi import Cookie
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.entities.schema.db import get_db
-from core.entities.schema.game import get_or_create_user, get_user_by_id, get_rankings
+from core.entities.schema.db import get_async_db
+from core.entities.schema.game import get_closed_games_async, get_final_profits_async
+from core.entities.schema.game import get_or_create_user_async, get_user_by_id_async, get_rankings_async
+from core.entities.schema.game import get_rank_async, get_users_around_async
 from core.entities.dto.user import SignInUserDTO
-from core.entities.dto.game import UserDTO, GameDTO
-from core.entities.dto.convert import user_to_dto, game_to_dto
+from core.entities.dto.game import UserDTO, GameHistoryDTO, RankedUserDTO
+from core.entities.dto.convert import user_to_dto
+from core.utils.clock import MarketClock, get_market_clock
+from app.services.leaderboard import leaderboard
 
 user_router = APIRouter(prefix="/user")
 
 
 @user_router.post("/signin")
-async def signin_new_user(req: SignInUserDTO, resp: Response, db: Session = Depends(get_db)) -> UserDTO:
-    user = get_or_create_user(db, req.nickname, req.password)
+async def signin_new_user(req: SignInUserDTO, resp: Response, db: AsyncSession = Depends(get_async_db)) -> UserDTO:
+    user = await get_or_create_user_async(db, req.nickname, req.password)
     if user is None:
         raise HTTPException(401, "Password mismatch")
     resp.set_cookie(key="user_id", value=str(user.id), expires=3600 * 24, httponly=True, secure=True, samesite="none")
@@ -30,10 +35,12 @@ async def signout_user(resp: Response):
 
 
 @user_router.get("/me")
-async def get_me(db: Session = Depends(get_db), user_id: Annotated[Union[int, None], Cookie()] = None) -> UserDTO:
+async def get_me(
+    db: AsyncSession = Depends(get_async_db), user_id: Annotated[Union[int, None], Cookie()] = None
+) -> UserDTO:
     if user_id is None:
         raise HTTPException(401, "Not signed in")
-    user = get_user_by_id(db, user_id)
+    user = await get_user_by_id_async(db, user_id)
     if user is None:
         raise HTTPException(404, "User not found")
     return user_to_dto(user)
@@ -41,17 +48,58 @@ async def get_me(db: Session = Depends(get_db), user_id: Annotated[Union[int, No
 
 @user_router.get("/history")
 async def get_history(
-    db: Session = Depends(get_db), user_id: Annotated[Union[int, None], Cookie()] = None
-) -> List[GameDTO]:
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    clock: MarketClock = Depends(get_market_clock),
+    user_id: Annotated[Union[int, None], Cookie()] = None,
+) -> List[GameHistoryDTO]:
+    """Closed games of the user. The next page starts before the closes_at and id of the last one."""
     if user_id is None:
         raise HTTPException(401, "Not signed in")
-    user = get_user_by_id(db, user_id)
+    if (before is None) != (before_id is None):
+        raise HTTPException(400, "before and before_id go together")
+    user = await get_user_by_id_async(db, user_id)
     if user is None:
         raise HTTPException(404, "User not found")
-    return [game_to_dto(g) for g in filter(lambda g: g.closed, user.games)]
+
+    cursor = (before, before_id) if before is not None and before_id is not None else None
+    rows = await get_closed_games_async(db, user_id, clock.now, limit, cursor)
+    profits = await get_final_profits_async(db, user_id, [r.id for r in rows if r.profit is None])
+    return [GameHistoryDTO(**{**r._mapping, "profit": profits.get(r.id, r.profit)}) for r in rows]
 
 
 @user_router.get("/ranking")
-async def get_ranking(db: Session = Depends(get_db)) -> List[UserDTO]:
-    ranking = get_rankings(db)
-    return [user_to_dto(u) for u in ranking]
+async def get_ranking(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+) -> List[UserDTO]:
+    page = leaderboard.page(offset, limit)
+    if page is None and offset + limit <= leaderboard.size:
+        top = await get_rankings_async(db, 0, leaderboard.size)
+        leaderboard.load((u.id, u.nickname, u.gold) for u in top)
+        page = leaderboard.page(offset, limit)
+    if page is None:
+        # Deeper than the board, read off the index
+        return [user_to_dto(u) for u in await get_rankings_async(db, offset, limit)]
+    return [UserDTO(id=id, nickname=nickname, gold=gold) for id, nickname, gold in page]
+
+
+@user_router.get("/ranking/me")
+async def get_ranking_around_me(
+    radius: int = Query(5, ge=0, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    user_id: Annotated[Union[int, None], Cookie()] = None,
+) -> List[RankedUserDTO]:
+    if user_id is None:
+        raise HTTPException(401, "Not signed in")
+    user = await get_user_by_id_async(db, user_id)
+    if user is None:
+        raise HTTPException(404, "User not found")
+
+    rank = await get_rank_async(db, user)
+    users = await get_users_around_async(db, user, radius)
+    first = rank - users.index(user)
+    return [RankedUserDTO(rank=first + i, id=u.id, nickname=u.nickname, gold=u.gold) for i, u in enumerate(users)]
@@ -1,18 +1,49 @@
+import os
+from contextlib import asynccontextmanager
 from typing import List
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
 
 from api import router
+from api.game.game import game_pool, market_scheduler
 from core.config import config
+from core.entities.schema.db import engine, async_engine
+from core.utils.query_counter import QueryCountMiddleware, count_queries
+from core.utils.thumbnail import is_content_named
+from core.utils.getimg import getimg_client
+
+
+class ThumbnailFiles(StaticFiles):
+    """Thumbnails named after their content never change once served, so they are cached for good.
+    Hidden files, as the prompt index, are not served."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        if any(part.startswith(".") for part in path.replace("\\", "/").split("/")):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        if not is_content_named(os.path.basename(full_path)):
+            return super().file_response(full_path, stat_result, scope, status_code)
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers["etag"] = f'"{os.path.basename(full_path)}"'
+        response.headers["cache-control"] = "public, max-age=31536000, immutable"
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
 
 
 def init_routers(app_: FastAPI) -> None:
     app_.include_router(router)
 
-    app_.mount("/thumbnails", StaticFiles(directory=config.thumbnails_path), name="thumbnails")
+    app_.mount("/thumbnails", ThumbnailFiles(directory=config.thumbnails_path), name="thumbnails")
 
 
 def make_middleware() -> List[Middleware]:
@@ -25,9 +56,24 @@ def make_middleware() -> List[Middleware]:
             allow_headers=["*"],
         ),
     ]
+    if config.db_query_header:
+        count_queries(engine)
+        count_queries(async_engine.sync_engine)
+        middleware.append(Middleware(QueryCountMiddleware))
     return middleware
 
 
+@asynccontextmanager
+async def lifespan(app_: FastAPI):
+    await getimg_client.start()
+    game_pool.start()
+    market_scheduler.start()
+    yield
+    await market_scheduler.stop()
+    await game_pool.stop()
+    await getimg_client.close()
+
+
 def create_app() -> FastAPI:
     app_ = FastAPI(
         title="Trader Week API",
@@ -35,6 +81,7 @@ def create_app() -> FastAPI:
         version="0.1.0",
         docs_url="/docs",
         middleware=make_middleware(),
+        lifespan=lifespan,
     )
     init_routers(app_=app_)
     return app_
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple
+
+# (game_id, visible day, version, last trade id)
+CacheKey = Tuple[int, int, int, int]
+
+
+def make_etag(key: CacheKey) -> str:
+    return '"g{}-d{}-v{}-t{}"'.format(*key)
+
+
+class GameCache:
+    """LRU cache of serialized GameDTOs.
+
+    A game only changes when its version is bumped, a trade is made or another
+    day becomes visible, so (game_id, visible day, version, last trade id)
+    identifies the response body.
+    Participant gold is the one field changing without the game, as trades in
+    other games are not tracked, and is refreshed on the next change.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: CacheKey, body: bytes):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
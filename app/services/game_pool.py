@@ -0,0 +1,145 @@
+import asyncio
+import time
+import zlib
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.game_service import GameService
+from core.entities.schema.db import AsyncSessionLocal, async_engine
+from core.entities.schema.game import (
+    Game,
+    User,
+    claim_pooled_game_async,
+    count_pooled_games_async,
+    create_pooled_game_async,
+)
+from core.utils.logger import logger
+
+
+def make_pool_key(language: str, theme: str) -> str:
+    return f"{language}:{' '.join(theme.lower().split())}"
+
+
+class GamePool:
+    """Keeps a number of ready-made games per (language, theme) so creation does not wait on generation.
+
+    Pooled games are stored unstarted and unowned, with their pool key set.
+    Requests claim one atomically and fall back to live generation when the
+    pool is empty. Only one worker refills at a time, through an advisory lock
+    on Postgres.
+    """
+
+    def __init__(
+        self,
+        service: GameService,
+        size: int,
+        languages: List[str],
+        themes: List[str],
+        interval: float = 30,
+    ):
+        self.service = service
+        self.size = size
+        self.keys = {make_pool_key(language, theme): (language, theme) for language in languages for theme in themes}
+        self.interval = interval
+
+        self.hits = 0
+        self.misses = 0
+        self._claimed_at: Deque[float] = deque()
+        self._refill_lags: Deque[float] = deque(maxlen=100)
+
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and len(self.keys) > 0
+
+    async def claim(self, db: AsyncSession, owner: User, language: str, theme: str) -> Optional[Game]:
+        key = make_pool_key(language, theme)
+        if key not in self.keys:
+            return None
+        game = await claim_pooled_game_async(db, key, owner)
+        if game is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._claimed_at.append(time.monotonic())
+        self._wake.set()
+        return game
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests > 0 else None,
+            "refill_lag": sum(self._refill_lags) / len(self._refill_lags) if self._refill_lags else None,
+            "refill_lag_max": max(self._refill_lags) if self._refill_lags else None,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refill()
+            except Exception:
+                logger.exception("Failed to refill game pool")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def refill(self):
+        async with async_engine.connect() as lock_conn:
+            if not await self._try_lock(lock_conn):
+                return
+            try:
+                for key, (language, theme) in self.keys.items():
+                    async with AsyncSessionLocal() as db:
+                        count = await count_pooled_games_async(db, key)
+                    for _ in range(count, self.size):
+                        await self._produce(key, language, theme)
+            finally:
+                await self._unlock(lock_conn)
+
+    async def _produce(self, key: str, language: str, theme: str):
+        logger.info(f"Generating pooled game for {key}")
+        # Generation takes seconds, so no session is open until the game is ready to insert
+        companies, title = await self.service.create_game_content(theme=theme, language=language)
+        async with AsyncSessionLocal() as db:
+            await create_pooled_game_async(db, title, companies, language, key)
+        if self._claimed_at:
+            self._refill_lags.append(time.monotonic() - self._claimed_at.popleft())
+
+    @staticmethod
+    def _lock_id() -> int:
+        return zlib.crc32(b"trader-week:game-pool")
+
+    async def _try_lock(self, conn) -> bool:
+        if conn.dialect.name != "postgresql":
+            return True
+        locked = bool(await conn.scalar(text("SELECT pg_try_advisory_lock(:id)"), {"id": self._lock_id()}))
+        # The lock is held by the connection, not the transaction, which is ended so it does not idle open
+        await conn.commit()
+        return locked
+
+    async def _unlock(self, conn):
+        if conn.dialect.name == "postgresql":
+            await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": self._lock_id()})
+            await conn.commit()
@@ -1,25 +1,24 @@
 import json
-import os
 import asyncio
-from typing import List, Dict, Any, Tuple
-from uuid import uuid1
-import base64
-from io import BytesIO
-from datetime import datetime, timedelta
+import time
+from typing import List, Dict, Any, Tuple, Optional
+from datetime import datetime
 from pydantic import BaseModel
 
 from openai import AsyncOpenAI
 from openai.types.chat import ChatCompletionMessageParam
 from openai.types.chat import ChatCompletionUserMessageParam, ChatCompletionAssistantMessageParam
 from openai.types.chat_model import ChatModel
-from PIL import Image
 from pytz import utc
 
 from core.entities.schema.game import Event, Company, Game, User, Trade
 from core.entities.dto.game import TradeReqDTO
 from core.config import config
+from core.utils.clock import MarketClock, DAY_LENGTH, DAYS
 from core.utils.logger import logger
-from core.utils.getimg import generate_image, GetImgResponse
+from core.utils.getimg import GetImgClient, GetImgResponse, getimg_client
+from core.utils.thumbnail import ThumbnailWriter
+from core.utils.llm_cache import LLMCache
 
 COMPANY_PROMPT = """'Create me 5 imaginary companies with very short descriptions.
 Theme: {theme}
@@ -86,32 +85,69 @@ class InvalidTradesException(GameException):
 
 
 class GameService:
-    def __init__(self, gpt_model: ChatModel = "gpt-4o-mini"):
-        self.openai_client = AsyncOpenAI(
+    def __init__(
+        self,
+        gpt_model: ChatModel = "gpt-4o-mini",
+        openai_client: Optional[AsyncOpenAI] = None,
+        image_client: Optional[GetImgClient] = None,
+        thumbnail_writer: Optional[ThumbnailWriter] = None,
+    ):
+        self.openai_client = openai_client or AsyncOpenAI(
             api_key=config.openai_key,
         )
+        self.image_client = image_client or getimg_client
         self.gpt_model = gpt_model
 
-        if not os.path.exists(config.thumbnails_path):
-            os.mkdir(config.thumbnails_path)
+        self.thumbnail_writer = thumbnail_writer or ThumbnailWriter(
+            config.thumbnails_path,
+            sizes=config.thumbnail_sizes,
+            formats=config.thumbnail_formats,
+        )
+
+        self.llm_cache: Optional[LLMCache] = None
+        if config.llm_cache_path:
+            self.llm_cache = LLMCache(
+                config.llm_cache_path,
+                ttl=config.llm_cache_ttl,
+                max_entries=config.llm_cache_max_entries,
+                reuse_rate=config.llm_cache_reuse_rate,
+            )
+
+    async def complete(self, messages: List[ChatCompletionMessageParam], language: str) -> Optional[str]:
+        """JSON chat completion, served from the response cache when enabled"""
+        key = None
+        if self.llm_cache is not None:
+            key = self.llm_cache.make_key(self.gpt_model, language, messages)
+            content = await self.llm_cache.get(key)
+            if content is not None:
+                return content
 
-    async def get_companies(self, theme: str, language: str) -> Tuple[List[Company], str]:
-        logger.info("Creating Companies...")
         resp = await self.openai_client.chat.completions.create(
             model=self.gpt_model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": COMPANY_PROMPT.format(
+            messages=messages,
+            response_format={"type": "json_object"},
+        )
+        content = resp.choices[0].message.content
+        if self.llm_cache is not None and key is not None and content:
+            await self.llm_cache.put(key, content)
+        return content
+
+    async def generate_companies(self, theme: str, language: str) -> Tuple[List[Company], List[CompanyFormat], str]:
+        logger.info("Creating Companies...")
+        content = await self.complete(
+            [
+                ChatCompletionUserMessageParam(
+                    role="user",
+                    content=COMPANY_PROMPT.format(
                         theme=theme,
                         language=language,
                     )
                     + COMPANY_PROMPT_FORMAT,
-                }
+                )
             ],
-            response_format={"type": "json_object"},
+            language,
         )
-        data: Dict[str, Any] = json.loads(resp.choices[0].message.content or "{}")
+        data: Dict[str, Any] = json.loads(content or "{}")
         game_forms: GameFormat = GameFormat(**data)
 
         companies = [
@@ -123,32 +159,60 @@ class GameService:
             for c in game_forms.companies
         ]
         logger.info("Companies Creation Complete")
-        logger.info("Creating Thumbnails...")
-        files = await self.get_companies_thumbnail(game_forms.companies)
+        return companies, game_forms.companies, data.get("title", theme)
+
+    async def create_game_content(
+        self,
+        theme: str,
+        language: str,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> Tuple[List[Company], str]:
+        """Generates companies, then their thumbnails and events concurrently.
+
+        Thumbnails only depend on the English names and descriptions, so they do not
+        wait for the events. A failure in either chain cancels the other one.
+        Seconds spent in each stage are recorded into timings.
+        """
+        timings = {} if timings is None else timings
+
+        async def timed(stage: str, coro):
+            started = time.perf_counter()
+            result = await coro
+            timings[stage] = time.perf_counter() - started
+            return result
+
+        companies, forms, title = await timed("companies", self.generate_companies(theme, language))
+
+        thumbnails = asyncio.create_task(timed("thumbnails", self.get_companies_thumbnail(forms)))
+        events = asyncio.create_task(timed("events", self.create_new_events(companies, language)))
+        try:
+            await asyncio.wait({thumbnails, events}, return_when=asyncio.FIRST_EXCEPTION)
+            files: List[str] = thumbnails.result() if thumbnails.done() else []
+            if events.done():
+                events.result()
+        finally:
+            pending = [t for t in (thumbnails, events) if not t.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
         for i in range(len(companies)):
             companies[i].thumbnail = files[i]
-        logger.info("Thumbnails creation complete")
-        return companies, data.get("title", theme)
+        logger.info(
+            "Game content created: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+        )
+        return companies, title
 
-    async def get_companies_thumbnail(self, companies: List[CompanyFormat]):
-        tasks = []
-        for c in companies:
-            task = generate_image(
-                f"A thumbnail image for the company. Name: {c.name_en}, Description: {c.description_en}",
-            )
-            tasks.append(task)
-
-        results: List[GetImgResponse] = await asyncio.gather(*tasks)
-        files = []
-        for resp in results:
-            b64_json = resp.image
-            data = base64.b64decode(b64_json)
-            img = Image.open(BytesIO(data))
-            fname = f"{uuid1()}.jpg"
-            fpath = os.path.join(config.thumbnails_path, fname)
-            img.save(fpath, "JPEG")
-            files.append(fname)
-        return files
+    async def get_companies_thumbnail(self, companies: List[CompanyFormat]) -> List[str]:
+        return list(await asyncio.gather(*[self.get_thumbnail(c) for c in companies]))
+
+    async def get_thumbnail(self, company: CompanyFormat) -> str:
+        prompt = f"A thumbnail image for the company. Name: {company.name_en}, Description: {company.description_en}"
+        fname = await self.thumbnail_writer.lookup(prompt)
+        if fname is None:
+            resp: GetImgResponse = await self.image_client.generate_image(prompt)
+            fname = await self.thumbnail_writer.write(resp.image, prompt)
+        return fname
 
     async def create_new_events(self, companies: List[Company], language: str) -> List[Event]:
         companies_prompt = ""
@@ -168,13 +232,8 @@ class GameService:
         logger.info("Creating Events...")
         for d in range(7):
             messages.append(ChatCompletionUserMessageParam(role="user", content=f"Day {d + 1}"))
-            resp = await self.openai_client.chat.completions.create(
-                messages=messages,
-                model=self.gpt_model,
-                response_format={"type": "json_object"},
-            )
-            msg = resp.choices[0].message
-            data = json.loads(msg.content or "{}")
+            content = await self.complete(messages, language)
+            data = json.loads(content or "{}")
             for i, e in enumerate(data["events"]):
                 new_event = Event(
                     day=d + 1,
@@ -187,7 +246,10 @@ class GameService:
                 companies[i].events.append(new_event)
 
             logger.info(f"Day {d + 1} creation complete")
-            messages.append(ChatCompletionAssistantMessageParam(role="assistant", content=msg.content))
+            messages.append(ChatCompletionAssistantMessageParam(role="assistant", content=content))
+
+        for c in companies:
+            c.compute_price_path()
         return events
 
     def start_game(self, game: Game):
@@ -195,9 +257,18 @@ class GameService:
         game.started_at = now
         for c in game.companies:
             for i, e in enumerate(c.events):
-                e.happen_at = now + timedelta(minutes=1 * (i + 1))
-
-    def perform_trades(self, user: User, game: Game, trade_reqs: List[TradeReqDTO]) -> List[Trade]:
+                e.happen_at = now + DAY_LENGTH * (i + 1)
+        game.closes_at = now + DAY_LENGTH * DAYS
+        game.bump_version()
+
+    def perform_trades(
+        self,
+        user: User,
+        game: Game,
+        trade_reqs: List[TradeReqDTO],
+        clock: Optional[MarketClock] = None,
+    ) -> List[Trade]:
+        clock = clock or MarketClock()
         company_dict = {c.id: c for c in game.companies}
         holdings = game.get_holdings(user)
         curr_gold = user.gold
@@ -208,7 +279,7 @@ class GameService:
             if t.company_id in company_dict:
                 company = company_dict[t.company_id]
 
-                price = company.prices[-1] * t.amount
+                price = company.visible_prices(clock)[-1] * t.amount
 
                 curr_gold -= price
                 holdings[company.id] += t.amount
@@ -218,7 +289,7 @@ class GameService:
                         user_id=user.id,
                         game_id=game.id,
                         company_id=t.company_id,
-                        day=len(company.filtered_events),
+                        day=clock.visible_count(company),
                         amount=t.amount,
                     )
                 )
@@ -231,29 +302,33 @@ class GameService:
         user.gold = curr_gold
         return trades
 
-    def get_game_result(self, game: Game) -> Dict[int, int]:
+    def get_game_result(self, game: Game, clock: Optional[MarketClock] = None) -> Dict[int, int]:
+        clock = clock or MarketClock()
         result = {u.id: 0 for u in game.users}
-        prices = {c.id: c.prices for c in game.companies}
+        prices = {c.id: c.visible_prices(clock) for c in game.companies}
         for t in game.trades:
             result[t.user_id] -= prices[t.company_id][t.day] * t.amount
-        for u in game.users:
-            holdings = game.get_holdings(u)
+        for user_id, holdings in game.holdings_by_user().items():
             for c in game.companies:
-                result[u.id] += prices[c.id][-1] * holdings[c.id]
+                result[user_id] += prices[c.id][-1] * holdings[c.id]
 
         return result
 
-    def throws_all_stocks(self, game: Game, user: User):
+    def throws_all_stocks(self, game: Game, user: User, clock: Optional[MarketClock] = None) -> List[Trade]:
+        clock = clock or MarketClock()
         holdings = game.get_holdings(user)
 
+        trades: List[Trade] = []
         for c in game.companies:
             if holdings[c.id] > 0:
-                game.trades.append(
+                trades.append(
                     Trade(
                         user_id=user.id,
+                        game_id=game.id,
                         day=7,
                         amount=-holdings[c.id],
                         company_id=c.id,
                     )
                 )
-                user.gold += holdings[c.id] * c.prices[-1]
+                user.gold += holdings[c.id] * c.visible_prices(clock)[-1]
+        return trades
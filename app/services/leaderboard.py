@@ -0,0 +1,107 @@
+import bisect
+import time
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from core.config import config
+from core.entities.schema.game import User
+
+# (-gold, id), the ranking order
+RankKey = Tuple[int, int]
+# (id, nickname, gold)
+Entry = Tuple[int, str, int]
+
+
+class Leaderboard:
+    """Users with the most gold, kept in memory and updated as commits change gold.
+
+    It holds every user ranking at or above its floor, the last user when it was
+    loaded, so the pages it covers are exact. Users falling below the floor are
+    dropped and the ones rising above it are inserted. Changes made by other
+    workers are only seen once the board is loaded again, ttl seconds later.
+    """
+
+    def __init__(self, size: int = 100, ttl: float = 30):
+        self.size = size
+        self.ttl = ttl
+
+        self._keys: List[RankKey] = []
+        self._entries: Dict[int, Entry] = {}
+        self._floor: Optional[RankKey] = None
+        self._complete = False
+        self._loaded_at: Optional[float] = None
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(user_id: int, gold: int) -> RankKey:
+        return (-gold, user_id)
+
+    def load(self, users: Iterable[Entry]):
+        """Replaces the board with the top users, as read from the database"""
+        with self._lock:
+            entries = list(users)[: self.size]
+            self._entries = {e[0]: e for e in entries}
+            self._keys = sorted(self._key(e[0], e[2]) for e in entries)
+            self._floor = self._keys[-1] if self._keys else None
+            self._complete = len(entries) < self.size
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def update(self, user_id: int, nickname: str, gold: int):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            old = self._entries.pop(user_id, None)
+            if old is not None:
+                self._keys.remove(self._key(old[0], old[2]))
+
+            key = self._key(user_id, gold)
+            if self._complete or (self._floor is not None and key <= self._floor):
+                bisect.insort(self._keys, key)
+                self._entries[user_id] = (user_id, nickname, gold)
+            if len(self._keys) > 2 * self.size:
+                # Trimmed back, everyone above the new floor is still on the board
+                for _, dropped in self._keys[self.size :]:
+                    del self._entries[dropped]
+                del self._keys[self.size :]
+                self._floor = self._keys[-1]
+                self._complete = False
+
+    def page(self, offset: int, limit: int) -> Optional[List[Entry]]:
+        """Users ranked offset + 1 and below, or None when the board cannot tell"""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                return None
+            if not self._complete and offset + limit > len(self._keys):
+                return None
+            return [self._entries[user_id] for _, user_id in self._keys[offset : offset + limit]]
+
+    def watch(self, target=Session):
+        """Feeds the board with the gold of users changed by sessions of target, once committed"""
+        event.listen(target, "after_flush", self._collect)
+        event.listen(target, "after_commit", self._apply)
+        event.listen(target, "after_rollback", self._discard)
+
+    def _collect(self, session: Session, flush_context):
+        changed: Dict[int, Entry] = session.info.setdefault(self, {})
+        for obj in session.new | session.dirty:
+            if isinstance(obj, User) and (obj in session.new or inspect(obj).attrs.gold.history.has_changes()):
+                changed[obj.id] = (obj.id, obj.nickname, obj.gold)
+
+    def _apply(self, session: Session):
+        for entry in session.info.pop(self, {}).values():
+            self.update(*entry)
+
+    def _discard(self, session: Session):
+        session.info.pop(self, None)
+
+
+# Shared by the routers, fed by every session of the worker
+leaderboard = Leaderboard(size=config.leaderboard_size, ttl=config.leaderboard_ttl)
+leaderboard.watch()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from pytz import utc
+
+from core.entities.schema.game import Game, Trade
+from core.utils.logger import logger
+
+# Messages a subscriber may lag behind before it gets disconnected
+MAX_PENDING = 64
+
+
+def encode_message(kind: str, payload: Any) -> bytes:
+    return f"event: {kind}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+def build_ticks(game: Game) -> List[Tuple[datetime, bytes]]:
+    """Pre-serializes the price tick of every day of a started game"""
+    ticks: List[Tuple[datetime, bytes]] = []
+    for day in range(1, len(game.companies[0].events) + 1):
+        events = [c.events[day - 1] for c in game.companies]
+        payload = {
+            "day": day,
+            "prices": {c.id: (c.price_path or c.compute_price_path())[day] for c in game.companies},
+            "events": [
+                {"id": e.id, "company_id": e.company_id, "description": e.description, "price": e.price} for e in events
+            ],
+        }
+        ticks.append((events[0].happen_at, encode_message("tick", payload)))
+    return ticks
+
+
+class _Channel:
+    def __init__(self, game_id: int, ticks: List[Tuple[datetime, bytes]]):
+        self.game_id = game_id
+        self.ticks = ticks
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.ticker: Optional[asyncio.Task] = None
+
+
+class MarketFeed:
+    """Fans out price ticks and trades of running games to streaming subscribers.
+
+    Every message is serialized once and the same bytes are queued to each
+    subscriber of the game. Ticks are driven from the event schedule, so every
+    worker emits them on its own; trades are only seen by subscribers on the
+    worker that committed them.
+    """
+
+    def __init__(self):
+        self._channels: Dict[int, _Channel] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @asynccontextmanager
+    async def subscribe(self, game: Game) -> AsyncIterator[asyncio.Queue]:
+        self._loop = asyncio.get_running_loop()
+        channel = self._channels.get(game.id)
+        if channel is None:
+            channel = _Channel(game.id, build_ticks(game))
+            channel.ticker = asyncio.create_task(self._run_ticker(channel))
+            self._channels[game.id] = channel
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING)
+        channel.subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers and self._channels.get(game.id) is channel:
+                del self._channels[game.id]
+                if channel.ticker is not None:
+                    channel.ticker.cancel()
+
+    def publish(self, game_id: int, kind: str, payload: Any):
+        """Queues a message to every subscriber of the game. Safe to call from worker threads."""
+        if game_id not in self._channels or self._loop is None:
+            return
+        data = encode_message(kind, payload)
+        try:
+            self._loop.call_soon_threadsafe(self._broadcast, game_id, data)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def publish_trades(self, game_id: int, trades: List[Trade]):
+        self.publish(
+            game_id,
+            "trade",
+            [{"company_id": t.company_id, "user_id": t.user_id, "amount": t.amount, "day": t.day} for t in trades],
+        )
+
+    def _broadcast(self, game_id: int, data: Optional[bytes]):
+        channel = self._channels.get(game_id)
+        if channel is None:
+            return
+        for queue in list(channel.subscribers):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Too slow to keep up, end its stream
+                channel.subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def _run_ticker(self, channel: _Channel):
+        try:
+            for happen_at, data in channel.ticks:
+                delay = (happen_at - datetime.now(utc)).total_seconds()
+                if delay < 0:
+                    continue
+                await asyncio.sleep(delay)
+                self._broadcast(channel.game_id, data)
+            self._broadcast(channel.game_id, encode_message("closed", {"game_id": channel.game_id}))
+            self._broadcast(channel.game_id, None)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.exception(f"Market feed ticker of game {channel.game_id} failed")
+            self._broadcast(channel.game_id, None)
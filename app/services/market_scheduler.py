@@ -0,0 +1,161 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from pytz import utc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.entities.schema.game import claim_market_day_async, get_ticking_games_async, release_market_day_async
+from core.utils.clock import DAY_LENGTH, DAYS, MARKET_HOURS
+from core.utils.logger import logger
+
+# Called with the game id and the day that just became visible
+DayCallback = Callable[[int, int], Awaitable[None]]
+# Called with the game id, once its last event happened or once trading stopped
+CloseCallback = Callable[[int], Awaitable[None]]
+
+# Transition following the last day, when trading stops MARKET_HOURS after the start
+MARKET_CLOSE = DAYS + 1
+
+
+class MarketScheduler:
+    """Fires callbacks when a day of a started game begins, when the game closes
+    with its last event and when its market closes, MARKET_HOURS after the start.
+
+    Transitions are kept in a heap ordered by time. The schedule is loaded from
+    the database on start, then scanned again every interval to pick up games
+    started on other workers. Every worker schedules every game, and each
+    transition is claimed with a conditional update on games.ticked_day before
+    its callbacks run, so it runs on one worker at a time. When a callback
+    fails, the claim is released and the next scan schedules the transition
+    again, so callbacks must be idempotent. A worker dying between the claim and
+    its callbacks loses the transition. Days missed while no worker was running
+    fire in order on the next scan.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], interval: float = 10):
+        self.session_factory = session_factory
+        self.interval = interval
+
+        self.fired = 0
+        self.skipped = 0
+        self.failed = 0
+
+        self._heap: List[Tuple[datetime, int, int]] = []
+        self._scheduled: Set[Tuple[int, int]] = set()
+        self._day_callbacks: List[DayCallback] = []
+        self._close_callbacks: List[CloseCallback] = []
+        self._market_close_callbacks: List[CloseCallback] = []
+
+        self._wake = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def on_day(self, callback: DayCallback):
+        self._day_callbacks.append(callback)
+
+    def on_close(self, callback: CloseCallback):
+        self._close_callbacks.append(callback)
+
+    def on_market_close(self, callback: CloseCallback):
+        self._market_close_callbacks.append(callback)
+
+    def schedule(self, game_id: int, started_at: datetime, ticked_day: int = 0):
+        """Schedules the transitions of a game after ticked_day. Safe to call from worker threads."""
+        if self._loop is None:
+            # Not running, the first scan will find the game
+            return
+        self._loop.call_soon_threadsafe(self._push, game_id, started_at, ticked_day)
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scheduled": len(self._heap),
+            "fired": self.fired,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "next_at": self._heap[0][0].isoformat() if self._heap else None,
+        }
+
+    async def load(self):
+        async with self.session_factory() as db:
+            games = await get_ticking_games_async(db)
+        for game_id, started_at, ticked_day in games:
+            self._push(game_id, started_at, ticked_day)
+
+    async def run_due(self):
+        """Fires the transitions whose time has come, in order"""
+        while self._heap and self._heap[0][0] <= datetime.now(utc):
+            _, game_id, day = heapq.heappop(self._heap)
+            self._scheduled.discard((game_id, day))
+            try:
+                await self._fire(game_id, day)
+            except Exception:
+                # The day is not ticked or its claim was released, so the next scan schedules it again
+                logger.exception(f"Failed to tick day {day} of game {game_id}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("Failed to load the market schedule")
+            deadline = time.monotonic() + self.interval
+            while (left := deadline - time.monotonic()) > 0:
+                await self.run_due()
+                if self._heap:
+                    left = min(left, (self._heap[0][0] - datetime.now(utc)).total_seconds())
+                try:
+                    await asyncio.wait_for(self._wake.wait(), max(left, 0))
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    def _push(self, game_id: int, started_at: datetime, ticked_day: int):
+        for day in range(ticked_day + 1, MARKET_CLOSE + 1):
+            if (game_id, day) not in self._scheduled:
+                self._scheduled.add((game_id, day))
+                due = started_at + (MARKET_HOURS if day == MARKET_CLOSE else DAY_LENGTH * day)
+                heapq.heappush(self._heap, (due, game_id, day))
+        self._wake.set()
+
+    async def _fire(self, game_id: int, day: int):
+        async with self.session_factory() as db:
+            if not await claim_market_day_async(db, game_id, day):
+                # Ticked by another worker already
+                self.skipped += 1
+                return
+
+        callbacks: List[Awaitable[None]] = []
+        if day <= DAYS:
+            callbacks += [callback(game_id, day) for callback in self._day_callbacks]
+        if day == DAYS:
+            callbacks += [callback(game_id) for callback in self._close_callbacks]
+        if day == MARKET_CLOSE:
+            callbacks += [callback(game_id) for callback in self._market_close_callbacks]
+        errors = [r for r in await asyncio.gather(*callbacks, return_exceptions=True) if isinstance(r, Exception)]
+        if not errors:
+            self.fired += 1
+            return
+
+        self.failed += 1
+        for error in errors:
+            logger.error(f"Transition callback of day {day} of game {game_id} failed: {error!r}")
+        async with self.session_factory() as db:
+            await release_market_day_async(db, game_id, day)
@@ -0,0 +1,192 @@
+from dataclasses import dataclass, field
+from threading import Condition, Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+from app.services.game_service import GameException, GameService
+from core.entities.dto.game import HoldingsDTO, TradeReqDTO
+from core.entities.schema.game import Game, Trade, get_game_by_id, get_user_by_id, update_positions
+from core.utils.clock import MarketClock
+from core.utils.logger import logger
+
+
+class TradeRejectedException(GameException):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class BatchAbortedException(GameException):
+    """The batch holding the trades failed to commit, nothing of it was written"""
+
+
+@dataclass
+class _Pending:
+    trades: List[Trade]
+    holdings: HoldingsDTO
+    done: bool = False
+    failed: bool = False
+    unknown: bool = False
+
+
+@dataclass
+class _GameBatch:
+    game_id: int
+    cond: Condition = field(default_factory=Condition)
+    db: Optional[Session] = None
+    game: Optional[Game] = None
+    pending: List[_Pending] = field(default_factory=list)
+    leader: bool = False
+
+
+class TradeBatcher:
+    """Group commit of trades, per game.
+
+    Trades are validated against the game state kept in memory and queued. The
+    first request of a batch waits up to window seconds, or until max_size
+    requests are queued, then writes the trades, positions and gold of the whole
+    batch in one transaction. A request is only acknowledged once its batch has
+    committed, so nothing acknowledged is lost on a crash, and a batch is all or
+    nothing.
+
+    The in-memory state goes stale when the same users trade elsewhere, in
+    another game or worker. The version on users then fails the commit, the
+    state is dropped and BatchAbortedException tells the requests of the batch
+    to fall back to their own transaction. Any other failure of the commit may
+    come after the data is written, so it is raised to the leader and reported
+    to the rest of the batch as a 500 instead of being retried.
+    """
+
+    def __init__(
+        self,
+        service: GameService,
+        session_factory: Callable[[], Session],
+        window: float,
+        max_size: int = 256,
+    ):
+        self.service = service
+        self.session_factory = session_factory
+        self.window = window
+        self.max_size = max_size
+
+        self.commits = 0
+        self.trades = 0
+        self.aborts = 0
+
+        self._batches: Dict[int, _GameBatch] = {}
+        self._lock = Lock()
+
+    def submit(
+        self,
+        game_id: int,
+        user_id: int,
+        trade_reqs: List[TradeReqDTO],
+        clock: MarketClock,
+    ) -> Tuple[HoldingsDTO, List[Trade]]:
+        with self._lock:
+            batch = self._batches.setdefault(game_id, _GameBatch(game_id))
+
+        with batch.cond:
+            pending = self._enqueue(batch, user_id, trade_reqs, clock)
+            if not batch.leader:
+                batch.leader = True
+                batch.cond.wait_for(lambda: len(batch.pending) >= self.max_size, timeout=self.window)
+                queued, batch.pending = batch.pending, []
+                batch.leader = False
+                self._flush(batch, queued)
+            else:
+                batch.cond.wait_for(lambda: pending.done)
+
+        if pending.unknown:
+            raise TradeRejectedException(500, f"Trade batch of game {game_id} failed, the trades may be committed")
+        if pending.failed:
+            raise BatchAbortedException(f"Trade batch of game {game_id} failed to commit")
+        return pending.holdings, pending.trades
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "commits": self.commits,
+            "trades": self.trades,
+            "aborts": self.aborts,
+            "trades_per_commit": self.trades / self.commits if self.commits > 0 else 0,
+        }
+
+    def _enqueue(
+        self,
+        batch: _GameBatch,
+        user_id: int,
+        trade_reqs: List[TradeReqDTO],
+        clock: MarketClock,
+    ) -> _Pending:
+        if batch.db is None:
+            batch.db = self.session_factory()
+            batch.game = get_game_by_id(batch.db, batch.game_id, profile="trade")
+        game = batch.game
+        if game is None:
+            self._close(batch)
+            raise TradeRejectedException(404, f"Game with id {batch.game_id} not found")
+
+        user = next((u for u in game.users if u.id == user_id), None)
+        if game.started_at is None or user is None:
+            if get_user_by_id(batch.db, user_id) is None:
+                raise TradeRejectedException(401, "Not signed in")
+            raise TradeRejectedException(403, "Not allowed to make trade in this game")
+        if not game.is_market_open(clock):
+            self._close(batch)
+            raise TradeRejectedException(403, "Market closed")
+
+        try:
+            trades = self.service.perform_trades(user, game, trade_reqs, clock)
+        except GameException as e:
+            raise TradeRejectedException(400, str(e))
+        # The user row is updated even when the gold nets out, so its version guards the holdings too
+        flag_modified(user, "gold")
+        batch.db.add_all(trades)
+        update_positions(batch.db, trades, game)
+
+        pending = _Pending(trades, HoldingsDTO(holdings=game.get_holdings(user), gold=user.gold))
+        batch.pending.append(pending)
+        if len(batch.pending) >= self.max_size:
+            batch.cond.notify_all()
+        return pending
+
+    def _flush(self, batch: _GameBatch, queued: List[_Pending]):
+        assert batch.db is not None
+        try:
+            batch.db.commit()
+            self.commits += 1
+            self.trades += sum(len(p.trades) for p in queued)
+        except Exception as e:
+            logger.warning(f"Trade batch of game {batch.game_id} failed to commit: {e!r}")
+            self.aborts += 1
+            for p in queued:
+                p.failed = True
+                # Raised by a listener, say, the commit may have gone through, so nothing is retried
+                p.unknown = not isinstance(e, SQLAlchemyError)
+            self._reset(batch)
+            if not isinstance(e, SQLAlchemyError):
+                raise
+        finally:
+            for p in queued:
+                p.done = True
+            batch.cond.notify_all()
+
+    def _reset(self, batch: _GameBatch):
+        # Called holding the batch's condition, the state is loaded again by the next request
+        if batch.db is not None:
+            # Rolls back what is left, also after a commit that failed past its end
+            batch.db.close()
+        batch.db = None
+        batch.game = None
+
+    def _close(self, batch: _GameBatch):
+        # Trading is over, but trades queued before still have to be flushed
+        if batch.pending:
+            return
+        self._reset(batch)
+        with self._lock:
+            if self._batches.get(batch.game_id) is batch:
+                del self._batches[batch.game_id]
@@ -10,18 +10,65 @@ with open(config_path, "r") as f:
     cfg: Dict[str, Any] = yaml.safe_load(f)
 
 
+def to_async_url(url: str) -> str:
+    for sync_prefix, async_prefix in (
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix) :]
+    return url
+
+
 class Config(BaseSettings):
     api_prefix: str = "/api"
     port: int = cfg.get("port", 3000)
 
     openai_key: str = cfg.get("openai_key", "")
     getimgai_key: str = cfg.get("getimgai_key", "")
+    getimgai_url: str = cfg.get("getimgai_url", "")
+    getimgai_concurrency: int = cfg.get("getimgai_concurrency", 5)
+    getimgai_timeout: float = cfg.get("getimgai_timeout", 60)
+    getimgai_retries: int = cfg.get("getimgai_retries", 3)
 
     database_url: str = cfg.get("database_url", "postgresql://localhost:5432")
+    async_database_url: str = cfg.get("async_database_url", to_async_url(database_url))
 
     thumbnails_path: str = cfg.get("thumbnails_path", "thumbnails")
+    # Downscaled variants written next to each thumbnail, formats PIL cannot encode are skipped
+    thumbnail_sizes: List[int] = cfg.get("thumbnail_sizes", [128, 256])
+    thumbnail_formats: List[str] = cfg.get("thumbnail_formats", ["webp", "avif"])
 
     allowed_origins: List[str] = cfg.get("allowed_origins", [])
 
+    # Local cache of LLM responses, disabled when no path is set
+    llm_cache_path: str = cfg.get("llm_cache_path", "")
+    llm_cache_ttl: float = cfg.get("llm_cache_ttl", 7 * 24 * 3600)
+    llm_cache_max_entries: int = cfg.get("llm_cache_max_entries", 1000)
+    llm_cache_reuse_rate: float = cfg.get("llm_cache_reuse_rate", 0.8)
+
+    # Adds the X-DB-Queries header to responses, for load tests
+    db_query_header: bool = cfg.get("db_query_header", False)
+
+    # Seconds trades wait to be committed together with others of the game, 0 commits each request alone
+    trade_batch_window: float = cfg.get("trade_batch_window", 0)
+    trade_batch_max_size: int = cfg.get("trade_batch_max_size", 256)
+
+    # Top users by gold kept in memory, reloaded after ttl seconds to see other workers' changes
+    leaderboard_size: int = cfg.get("leaderboard_size", 100)
+    leaderboard_ttl: float = cfg.get("leaderboard_ttl", 30)
+
+    # Seconds between scans of the market schedule for games started on other workers
+    market_scheduler_interval: float = cfg.get("market_scheduler_interval", 10)
+
+    game_cache_size: int = cfg.get("game_cache_size", 1024)
+
+    # Pre-generated games kept per (language, theme), 0 disables the pool
+    game_pool_size: int = cfg.get("game_pool_size", 0)
+    game_pool_languages: List[str] = cfg.get("game_pool_languages", ["en"])
+    game_pool_themes: List[str] = cfg.get("game_pool_themes", [])
+    game_pool_interval: float = cfg.get("game_pool_interval", 30)
+
 
 config: Config = Config()
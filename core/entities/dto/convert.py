@@ -1,8 +1,12 @@
 from core.entities.schema.game import Game, Trade, Company, User, Event
 from core.entities.dto.game import GameDTO, TradeDTO, CompanyDTO, EventDTO, UserDTO, ParticipantDTO
+from core.entities.dto.game import ThumbnailVariantDTO
 
-from datetime import datetime
-from pytz import utc
+from typing import Optional, Dict, List
+
+from core.config import config
+from core.utils.clock import MarketClock
+from core.utils.thumbnail import list_variants
 
 
 def user_to_dto(user: User) -> UserDTO:
@@ -13,27 +17,38 @@ def user_to_dto(user: User) -> UserDTO:
     )
 
 
-def user_to_participant(user: User, game: Game) -> ParticipantDTO:
+def user_to_participant(user: User, game: Game, holdings: Optional[Dict[int, int]] = None) -> ParticipantDTO:
     return ParticipantDTO(
         id=user.id,
         nickname=user.nickname,
         gold=user.gold,
-        holdings=game.get_holdings(user),
+        holdings=holdings if holdings is not None else game.get_holdings(user),
     )
 
 
-def event_to_dto(e: Event) -> EventDTO:
+def event_to_dto(e: Event, clock: Optional[MarketClock] = None) -> EventDTO:
     return EventDTO(
         id=e.id,
         description=e.description,
         price=e.price,
         happen_at=e.happen_at,
-        ms_left=max(int((e.happen_at - datetime.now(utc)).total_seconds() * 1000), 0),
+        ms_left=(clock or MarketClock()).ms_left(e),
+    )
+
+
+def thumbnail_variants(thumbnail: str) -> List[ThumbnailVariantDTO]:
+    variants = list_variants(
+        config.thumbnails_path,
+        thumbnail,
+        tuple(config.thumbnail_sizes),
+        tuple(config.thumbnail_formats),
     )
+    return [ThumbnailVariantDTO(file=file, size=size, format=fmt) for file, size, fmt in variants]
 
 
-def company_to_dto(company: Company) -> CompanyDTO:
-    price_history = company.prices
+def company_to_dto(company: Company, clock: Optional[MarketClock] = None) -> CompanyDTO:
+    clock = clock or MarketClock()
+    price_history = company.visible_prices(clock)
     return CompanyDTO(
         id=company.id,
         name=company.name,
@@ -41,7 +56,8 @@ def company_to_dto(company: Company) -> CompanyDTO:
         price=price_history[-1],
         history=price_history,
         thumbnail=company.thumbnail,
-        events=[event_to_dto(e) for e in company.filtered_events],
+        thumbnails=thumbnail_variants(company.thumbnail),
+        events=[event_to_dto(e, clock) for e in company.visible_events(clock)],
     )
 
 
@@ -49,15 +65,17 @@ def trade_to_dto(trade: Trade) -> TradeDTO:
     return TradeDTO(company_id=trade.company_id, user_id=trade.user_id, amount=trade.amount, day=trade.day)
 
 
-def game_to_dto(game: Game) -> GameDTO:
+def game_to_dto(game: Game, clock: Optional[MarketClock] = None) -> GameDTO:
+    clock = clock or MarketClock()
+    holdings = game.holdings_by_user()
     return GameDTO(
         id=game.id,
         theme=game.theme,
         started=game.started,
         owner_id=game.owner_id,
         started_at=game.started_at,
-        closed=game.closed,
-        companies=[company_to_dto(c) for c in game.companies],
-        participants=[user_to_participant(user, game) for user in game.users],
+        closed=game.is_closed(clock),
+        companies=[company_to_dto(c, clock) for c in game.companies],
+        participants=[user_to_participant(user, game, holdings[user.id]) for user in game.users],
         trades=[trade_to_dto(trade) for trade in game.trades],
     )
@@ -12,12 +12,19 @@ class EventDTO(BaseModel):
     ms_left: int
 
 
+class ThumbnailVariantDTO(BaseModel):
+    file: str
+    size: int
+    format: str
+
+
 class CompanyDTO(BaseModel):
     id: int
     name: str
     description: str
     price: int
     thumbnail: str
+    thumbnails: List[ThumbnailVariantDTO] = Field(default_factory=list)
     events: List[EventDTO]
     history: List[int]
 
@@ -39,6 +46,25 @@ class GameDTO(BaseModel):
     owner_id: Optional[int]
 
 
+class GameSummaryDTO(BaseModel):
+    id: int
+    theme: str
+    language: str
+    created_at: datetime
+    players: int
+    owner_id: Optional[int]
+    owner_nickname: Optional[str]
+
+
+class GameHistoryDTO(BaseModel):
+    id: int
+    theme: str
+    language: str
+    started_at: datetime
+    closes_at: datetime
+    profit: int
+
+
 class ParticipantDTO(BaseModel):
     id: int
     nickname: str
@@ -52,6 +78,20 @@ class UserDTO(BaseModel):
     gold: int
 
 
+class RankedUserDTO(BaseModel):
+    rank: int
+    id: int
+    nickname: str
+    gold: int
+
+
+class GameRankDTO(BaseModel):
+    rank: int
+    id: int
+    nickname: str
+    profit: int
+
+
 class TradeDTO(BaseModel):
     company_id: int
     user_id: int
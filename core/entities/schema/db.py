@@ -1,6 +1,7 @@
-from typing import Generator, Any
+from typing import Generator, AsyncGenerator, Any
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 
 from core.config import config
@@ -10,12 +11,25 @@ engine = create_engine(
     config.database_url,
 )
 
+# Objects stay usable after commit, so handlers can serialize what they just
+# wrote without reloading the whole game aggregate.
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
+    expire_on_commit=False,
     bind=engine,
 )
 
+async_engine = create_async_engine(
+    config.async_database_url,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    autoflush=False,
+    expire_on_commit=False,
+    bind=async_engine,
+)
+
 Base = declarative_base()
 
 
@@ -30,3 +44,8 @@ def get_db() -> Generator[Session, Any, Any]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, Any]:
+    async with AsyncSessionLocal() as db:
+        yield db
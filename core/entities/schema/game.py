@@ -1,16 +1,36 @@
-from typing import List, Optional, Dict
-
-from sqlalchemy import String, ForeignKey, exists, Table, Column, DateTime
-from sqlalchemy.orm import Session, Mapped, mapped_column, relationship
+import asyncio
+from typing import List, Optional, Dict, Tuple
+
+from sqlalchemy import String, ForeignKey, exists, Table, Column, DateTime, Integer, JSON, event, inspect, select
+from sqlalchemy import Index, TypeDecorator, and_, case, insert, literal, or_, text, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session, Mapped, mapped_column, relationship, selectinload
+from sqlalchemy.orm.interfaces import LoaderOption
 from sqlalchemy.sql import func
 import bcrypt
+from pytz import utc
 
 from core.entities.schema.db import Base
-from datetime import datetime, timedelta
-from pytz import utc
+from core.utils.clock import MARKET_HOURS, MarketClock
+from datetime import datetime
 
 INITIAL_GOLD = 10_000
 
+
+class UTCDateTime(TypeDecorator):
+    """Timezone-aware timestamp, also on SQLite which returns them naive. Timestamps are stored in UTC."""
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_result_value(self, value: Optional[datetime], dialect) -> Optional[datetime]:
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=utc)
+        return value
+
+
 # For User - Game association
 association_table = Table(
     "users_games",
@@ -36,9 +56,43 @@ class Game(Base):
         back_populates="games",
     )
     trades: Mapped[List["Trade"]] = relationship()
+    positions: Mapped[List["Position"]] = relationship()
+
+    created_at: Mapped[datetime] = mapped_column(UTCDateTime(timezone=True), server_default=func.now())
+    started_at: Mapped[datetime] = mapped_column(UTCDateTime(timezone=True), nullable=True)
+    # When the last event happens, set by start_game. See get_closed_games_async
+    closes_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime(timezone=True), nullable=True, index=True)
+    # Last transition that ran, a day or the market close after it, see MarketScheduler
+    ticked_day: Mapped[int] = mapped_column(default=0, server_default="0")
+    # Set once the final results are stored, see save_game_results
+    results_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime(timezone=True), nullable=True)
+    # Set once every position left is sold, see settle_game. No trades are taken after.
+    settled_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime(timezone=True), nullable=True)
+
+    # Set while the game waits unowned in the pre-generated pool, see GamePool
+    pool_key: Mapped[Optional[str]] = mapped_column(nullable=True, index=True)
+
+    # Lobby listing, see get_game_summaries_async
+    __table_args__ = (
+        Index(
+            "ix_games_lobby",
+            "language",
+            "created_at",
+            postgresql_where=text("started_at IS NULL"),
+            sqlite_where=text("started_at IS NULL"),
+        ),
+        # Games with transitions left, see get_ticking_games_async
+        Index(
+            "ix_games_ticking",
+            "closes_at",
+            postgresql_where=text("ticked_day < 8"),
+            sqlite_where=text("ticked_day < 8"),
+        ),
+    )
 
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
-    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Bumped on every change of the game state but trades, which are told apart by
+    # their ids instead, so trading never writes to the game row. See bump_version
+    version: Mapped[int] = mapped_column(default=0, server_default="0")
 
     @property
     def started(self) -> bool:
@@ -46,14 +100,38 @@ class Game(Base):
 
     @property
     def closed(self) -> bool:
-        return len(self.companies[0].filtered_events) == 7
+        return self.is_closed()
+
+    def is_closed(self, clock: Optional[MarketClock] = None) -> bool:
+        clock = clock or MarketClock()
+        if self.closes_at is not None:
+            # Same as every event being visible, without loading them
+            return self.closes_at < clock.now
+        return clock.visible_count(self.companies[0]) == 7
+
+    def is_market_open(self, clock: Optional[MarketClock] = None) -> bool:
+        """Whether trades are taken, until MARKET_HOURS after the start or the settlement"""
+        if self.started_at is None or self.settled_at is not None:
+            return False
+        return (clock or MarketClock()).now - self.started_at <= MARKET_HOURS
+
+    def bump_version(self):
+        # Incremented in SQL, so concurrent writers never reuse a version
+        self.version = Game.version + 1
 
     def get_holdings(self, user: "User") -> Dict[int, int]:
         holdings = {c.id: 0 for c in self.companies}
-        for t in filter(lambda t: t.user_id == user.id, self.trades):
-            holdings[t.company_id] += t.amount
+        for p in filter(lambda p: p.user_id == user.id, self.positions):
+            holdings[p.company_id] = p.amount
         return holdings
 
+    def holdings_by_user(self) -> Dict[int, Dict[int, int]]:
+        table = {u.id: {c.id: 0 for c in self.companies} for u in self.users}
+        for p in self.positions:
+            if p.user_id in table:
+                table[p.user_id][p.company_id] = p.amount
+        return table
+
 
 class Company(Base):
     __tablename__ = "companies"
@@ -67,24 +145,37 @@ class Company(Base):
     name = mapped_column(String)
     description = mapped_column(String)
     price: Mapped[int] = mapped_column()
+    # Price after each day, index 0 being the initial price. Filled once events are generated.
+    price_path: Mapped[Optional[List[int]]] = mapped_column(
+        ARRAY(Integer).with_variant(JSON(), "sqlite"),
+        nullable=True,
+    )
 
-    events: Mapped[List["Event"]] = relationship(back_populates="company")
+    events: Mapped[List["Event"]] = relationship(back_populates="company", order_by="Event.day")
 
     @property
     def filtered_events(self) -> List["Event"]:
-        if not self.game.started:
-            return []
-        now = datetime.now(utc)
-        return list(filter(lambda e: (e.happen_at - now) < timedelta(seconds=0), self.events))
+        return self.visible_events()
+
+    def visible_events(self, clock: Optional[MarketClock] = None) -> List["Event"]:
+        return (clock or MarketClock()).visible_events(self)
 
     @property
     def prices(self) -> List[int]:
+        return self.visible_prices()
+
+    def visible_prices(self, clock: Optional[MarketClock] = None) -> List[int]:
+        path = self.price_path if self.price_path is not None else self.compute_price_path()
+        return path[: (clock or MarketClock()).visible_count(self) + 1]
+
+    def compute_price_path(self) -> List[int]:
         curr = self.price
-        history = [self.price]
-        for e in self.filtered_events:
+        path = [curr]
+        for e in sorted(self.events, key=lambda e: e.day):
             curr += int(curr * e.price / 100)
-            history.append(curr)
-        return history
+            path.append(curr)
+        self.price_path = path
+        return path
 
 
 class Event(Base):
@@ -96,12 +187,30 @@ class Event(Base):
     description: Mapped[str] = mapped_column()
     price: Mapped[int] = mapped_column()
 
-    happen_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    happen_at: Mapped[datetime] = mapped_column(UTCDateTime(timezone=True))
 
     company_id: Mapped[int] = mapped_column(ForeignKey("companies.id"))
     company: Mapped["Company"] = relationship(back_populates="events")
 
 
+@event.listens_for(Company.events, "append")
+@event.listens_for(Company.events, "remove")
+def _invalidate_price_path_on_events(company: Company, *args):
+    company.price_path = None
+
+
+@event.listens_for(Company.price, "set")
+def _invalidate_price_path_on_price(company: Company, *args):
+    company.price_path = None
+
+
+@event.listens_for(Event.price, "set")
+@event.listens_for(Event.day, "set")
+def _invalidate_price_path_on_event(e: Event, *args):
+    if e.company is not None:
+        e.company.price_path = None
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -116,9 +225,19 @@ class User(Base):
         back_populates="users",
     )
 
+    # Checked and incremented by every UPDATE of the row, so a transaction that read
+    # the gold or holdings before a concurrent trade fails with StaleDataError
+    version: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    __mapper_args__ = {"version_id_col": version}
+    # Ranking order, see get_rank_async
+    __table_args__ = (Index("ix_users_gold_id", gold.desc(), id),)
+
 
 class Trade(Base):
     __tablename__ = "trades"
+    # For the last trade of a game, which versions its cached state
+    __table_args__ = (Index("ix_trades_game_id_id", "game_id", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -130,10 +249,64 @@ class Trade(Base):
     amount: Mapped[int] = mapped_column()
 
 
+class Position(Base):
+    """Current holdings of a user in a game, kept in sync with trades by create_trades"""
+
+    __tablename__ = "positions"
+
+    game_id: Mapped[int] = mapped_column(ForeignKey("games.id"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    company_id: Mapped[int] = mapped_column(ForeignKey("companies.id"), primary_key=True)
+
+    amount: Mapped[int] = mapped_column(default=0)
+
+
+class GameResult(Base):
+    """Final profit of a user in a closed game, stored once by save_game_results"""
+
+    __tablename__ = "game_results"
+
+    game_id: Mapped[int] = mapped_column(ForeignKey("games.id"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+
+    profit: Mapped[int] = mapped_column()
+
+    # Ranking order of a game, see get_stored_ranking
+    __table_args__ = (Index("ix_game_results_game_id_profit", game_id, profit.desc(), user_id),)
+
+
+# Load profiles for the game aggregate. Every relationship is loaded with a single
+# SELECT ... IN over all the games of the query, so the number of queries is fixed:
+#   lobby: games + companies, users, positions, trades                  (5 queries)
+#   game:  lobby + events                                               (6 queries)
+#   trade: games + companies, events, users, positions, no trades       (5 queries)
+# Company.game is resolved from the identity map without a query.
+LOAD_PROFILES: Dict[str, List[LoaderOption]] = {
+    "lobby": [
+        selectinload(Game.companies),
+        selectinload(Game.users),
+        selectinload(Game.positions),
+        selectinload(Game.trades),
+    ],
+    "game": [
+        selectinload(Game.companies).selectinload(Company.events),
+        selectinload(Game.users),
+        selectinload(Game.positions),
+        selectinload(Game.trades),
+    ],
+    "trade": [
+        selectinload(Game.companies).selectinload(Company.events),
+        selectinload(Game.users),
+        selectinload(Game.positions),
+    ],
+}
+
+
 def get_all_games(db: Session, language: str) -> List[Game]:
     return (
         db.query(Game)
-        .where(Game.started_at.is_(None) & (Game.language == language))
+        .options(*LOAD_PROFILES["lobby"])
+        .where(Game.started_at.is_(None) & Game.pool_key.is_(None) & (Game.language == language))
         .order_by(Game.created_at.desc())
         .all()
     )
@@ -142,7 +315,7 @@ def get_all_games(db: Session, language: str) -> List[Game]:
 def get_last_game(
     db: Session,
 ) -> Optional[Game]:
-    return db.query(Game).order_by(Game.created_at.desc()).limit(1).scalar()
+    return db.query(Game).where(Game.pool_key.is_(None)).order_by(Game.created_at.desc()).limit(1).scalar()
 
 
 def create_game(
@@ -164,11 +337,8 @@ def create_game(
     return game
 
 
-def get_game_by_id(db: Session, id: int) -> Optional[Game]:
-    if db.query(exists(Game).where(Game.id == id)).scalar():
-        return db.query(Game).where(Game.id == id).scalar()
-    else:
-        return None
+def get_game_by_id(db: Session, id: int, profile: str = "game") -> Optional[Game]:
+    return db.query(Game).options(*LOAD_PROFILES[profile]).where(Game.id == id).one_or_none()
 
 
 def get_or_create_user(
@@ -195,20 +365,410 @@ def get_or_create_user(
 
 
 def get_user_by_id(db: Session, id: int) -> Optional[User]:
-    if db.query(exists(User).where(User.id == id)).scalar():
-        return db.query(User).where(User.id == id).scalar()
-    else:
-        return None
+    return db.query(User).where(User.id == id).one_or_none()
 
 
 def create_trades(
     db: Session,
     trades: List[Trade],
+    game: Optional[Game] = None,
 ) -> List[Trade]:
     db.add_all(trades)
+    update_positions(db, trades, game)
+    if game is not None and "trades" not in inspect(game).unloaded:
+        game.trades.extend(trades)
     db.commit()
     return trades
 
 
-def get_rankings(db: Session) -> List[User]:
-    return db.query(User).order_by(User.gold.desc()).limit(10).all()
+def update_positions(db: Session, trades: List[Trade], game: Optional[Game] = None):
+    """Applies trades to the positions table within the current transaction.
+
+    When the game is given with its positions loaded, they are updated in place
+    so the game stays consistent after commit without being reloaded.
+    """
+    positions: Dict[Tuple[int, int, int], Position] = {}
+    if game is not None and "positions" not in inspect(game).unloaded:
+        for p in game.positions:
+            positions[(p.game_id, p.user_id, p.company_id)] = p
+    else:
+        game = None
+        for game_id, user_id in {(t.game_id, t.user_id) for t in trades}:
+            for p in db.query(Position).where((Position.game_id == game_id) & (Position.user_id == user_id)):
+                positions[(p.game_id, p.user_id, p.company_id)] = p
+
+    for t in trades:
+        key = (t.game_id, t.user_id, t.company_id)
+        if key not in positions:
+            positions[key] = Position(game_id=t.game_id, user_id=t.user_id, company_id=t.company_id, amount=0)
+            if game is not None:
+                game.positions.append(positions[key])
+            else:
+                db.add(positions[key])
+        positions[key].amount += t.amount
+
+
+def get_game_results(db: Session, game_id: int) -> Optional[Dict[int, int]]:
+    """Stored results of the game, or None when they are not stored (yet)"""
+    rows = db.execute(
+        select(Game.results_at, GameResult.user_id, GameResult.profit)
+        .outerjoin(GameResult, GameResult.game_id == Game.id)
+        .where(Game.id == game_id)
+    ).all()
+    if not rows or rows[0].results_at is None:
+        return None
+    return {r.user_id: r.profit for r in rows if r.user_id is not None}
+
+
+def get_stored_ranking(db: Session, game_id: int) -> Optional[List[Row]]:
+    """Stored results of the game as (user_id, nickname, profit) rows, best profit first
+    and ties broken by user id, or None when they are not stored (yet)"""
+    if db.scalar(select(Game.results_at).where(Game.id == game_id)) is None:
+        return None
+    return list(
+        db.execute(
+            select(GameResult.user_id, User.nickname, GameResult.profit)
+            .join(User, User.id == GameResult.user_id)
+            .where(GameResult.game_id == game_id)
+            .order_by(GameResult.profit.desc(), GameResult.user_id)
+        ).all()
+    )
+
+
+def save_game_results(db: Session, game_id: int, result: Dict[int, int]) -> bool:
+    """Stores the final results of a closed game, unless they are stored already.
+
+    The game row is claimed first with a conditional update, which holds its lock
+    until commit, so the results are written exactly once however many readers
+    or workers race to store them. Returns whether this call stored them.
+    """
+    claimed = db.execute(
+        update(Game).where((Game.id == game_id) & Game.results_at.is_(None)).values(results_at=func.now())
+    )
+    if claimed.rowcount != 1:  # type: ignore
+        db.rollback()
+        return False
+    if result:
+        db.execute(
+            insert(GameResult),
+            [{"game_id": game_id, "user_id": user_id, "profit": profit} for user_id, profit in result.items()],
+        )
+    db.commit()
+    return True
+
+
+def settle_game(db: Session, game_id: int) -> bool:
+    """Sells every position left at the final prices once the market closed, unless it is settled already.
+
+    Runs as a few set-based statements in one transaction, whatever the number
+    of players. The game row is claimed first, as by save_game_results, so a game
+    is settled exactly once. The version of every player is bumped, so trades
+    racing the settlement fail and are read again against the settled game.
+    Gold is updated out of sight of the in-memory leaderboards, so other workers
+    rank the players on their gold before settlement until their boards reload.
+    Returns whether this call settled it.
+    """
+    claimed = db.execute(
+        update(Game).where((Game.id == game_id) & Game.settled_at.is_(None)).values(settled_at=func.now())
+    )
+    if claimed.rowcount != 1:  # type: ignore
+        db.rollback()
+        return False
+
+    final_prices = {
+        company_id: path[-1]
+        for company_id, path in db.execute(select(Company.id, Company.price_path).where(Company.game_id == game_id))
+        if path
+    }
+    open_positions = (Position.game_id == game_id) & (Position.amount > 0)
+    if final_prices:
+        proceeds = (
+            select(func.sum(Position.amount * case(final_prices, value=Position.company_id, else_=0)))
+            .where(open_positions & (Position.user_id == User.id))
+            .scalar_subquery()
+        )
+        players = select(association_table.c.left_id).where(association_table.c.right_id == game_id)
+        db.execute(
+            update(User)
+            .where(User.id.in_(players))
+            .values(gold=User.gold + func.coalesce(proceeds, 0), version=User.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            insert(Trade).from_select(
+                ["user_id", "game_id", "company_id", "day", "amount"],
+                select(Position.user_id, Position.game_id, Position.company_id, literal(7), -Position.amount).where(
+                    open_positions
+                ),
+            )
+        )
+        db.execute(update(Position).where(open_positions).values(amount=0).execution_options(synchronize_session=False))
+    db.commit()
+    return True
+
+
+def get_rankings(db: Session, offset: int = 0, limit: int = 10) -> List[User]:
+    return db.query(User).order_by(User.gold.desc(), User.id).offset(offset).limit(limit).all()
+
+
+# Async ports of the query helpers, for handlers running on the event loop.
+# Objects they return are fully loaded, since lazy loading is not available on AsyncSession.
+async def get_last_game_async(db: AsyncSession) -> Optional[Game]:
+    return await db.scalar(select(Game).where(Game.pool_key.is_(None)).order_by(Game.created_at.desc()).limit(1))
+
+
+async def create_game_async(
+    db: AsyncSession,
+    theme: str,
+    owner: User,
+    companies: List[Company],
+    language: str,
+) -> Game:
+    game = Game(
+        theme=theme,
+        owner_id=owner.id,
+        companies=companies,
+        language=language,
+        users=[owner],
+        trades=[],
+        positions=[],
+    )
+    db.add(game)
+    await db.commit()
+    await db.refresh(game, ["created_at"])
+    return game
+
+
+async def create_pooled_game_async(
+    db: AsyncSession,
+    theme: str,
+    companies: List[Company],
+    language: str,
+    pool_key: str,
+) -> Game:
+    game = Game(
+        theme=theme,
+        companies=companies,
+        language=language,
+        pool_key=pool_key,
+    )
+    db.add(game)
+    await db.commit()
+    return game
+
+
+async def count_pooled_games_async(db: AsyncSession, pool_key: str) -> int:
+    return await db.scalar(select(func.count()).select_from(Game).where(Game.pool_key == pool_key)) or 0
+
+
+async def claim_pooled_game_async(db: AsyncSession, pool_key: str, owner: User) -> Optional[Game]:
+    """Hands a pooled game over to its new owner, or returns None when the pool is empty"""
+    # Read before a lost race rolls back, which expires the owner
+    owner_id = owner.id
+    for _ in range(3):
+        game_id = await db.scalar(
+            select(Game.id)
+            .where(Game.pool_key == pool_key)
+            .order_by(Game.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if game_id is None:
+            return None
+        # Conditional, so two claims of the same game cannot both succeed
+        result = await db.execute(
+            update(Game)
+            .where((Game.id == game_id) & (Game.pool_key == pool_key))
+            .values(pool_key=None, owner_id=owner_id, created_at=func.now())
+        )
+        if result.rowcount == 1:  # type: ignore
+            await db.execute(insert(association_table).values(left_id=owner_id, right_id=game_id))
+            await db.commit()
+            return await get_game_by_id_async(db, game_id)
+        await db.rollback()
+    return None
+
+
+async def get_game_version_async(db: AsyncSession, id: int) -> Optional[Tuple[int, int, Optional[datetime]]]:
+    """(version, last trade id, started_at) of the game, which change with its state. None for
+    pooled games, which are not visible until claimed."""
+    last_trade = select(func.coalesce(func.max(Trade.id), 0)).where(Trade.game_id == id).scalar_subquery()
+    row = (
+        await db.execute(
+            select(Game.version, last_trade.label("last_trade"), Game.started_at).where(
+                (Game.id == id) & Game.pool_key.is_(None)
+            )
+        )
+    ).one_or_none()
+    return None if row is None else (row.version, row.last_trade, row.started_at)
+
+
+async def get_game_summaries_async(
+    db: AsyncSession,
+    language: str,
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+) -> List[Row]:
+    """Unstarted games, newest first, with their player count and owner in one query.
+
+    Pages are keyed on (created_at, id) of the last game of the previous page,
+    so each is read off ix_games_lobby without skipping rows.
+    """
+    query = (
+        select(
+            Game.id,
+            Game.theme,
+            Game.language,
+            Game.created_at,
+            Game.owner_id,
+            User.nickname.label("owner_nickname"),
+            func.count(association_table.c.left_id).label("players"),
+        )
+        .outerjoin(association_table, association_table.c.right_id == Game.id)
+        .outerjoin(User, User.id == Game.owner_id)
+        .where(Game.started_at.is_(None) & Game.pool_key.is_(None) & (Game.language == language))
+        .group_by(Game.id, User.id)
+        .order_by(Game.created_at.desc(), Game.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        created_at, id = before
+        query = query.where(or_(Game.created_at < created_at, and_(Game.created_at == created_at, Game.id < id)))
+    return list((await db.execute(query)).all())
+
+
+async def get_closed_games_async(
+    db: AsyncSession,
+    user_id: int,
+    now: datetime,
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+) -> List[Row]:
+    """Closed games of the user, last closed first, with the profit stored for the user if any.
+
+    Pages are keyed on (closes_at, id) of the last game of the previous page.
+    """
+    query = (
+        select(Game.id, Game.theme, Game.language, Game.started_at, Game.closes_at, GameResult.profit)
+        .join(association_table, association_table.c.right_id == Game.id)
+        .outerjoin(GameResult, (GameResult.game_id == Game.id) & (GameResult.user_id == user_id))
+        .where((association_table.c.left_id == user_id) & (Game.closes_at < now))
+        .order_by(Game.closes_at.desc(), Game.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        closes_at, id = before
+        query = query.where(or_(Game.closes_at < closes_at, and_(Game.closes_at == closes_at, Game.id < id)))
+    return list((await db.execute(query)).all())
+
+
+async def get_final_profits_async(db: AsyncSession, user_id: int, game_ids: List[int]) -> Dict[int, int]:
+    """Profit of the user in each of the closed games, valuing what is still held at the final prices.
+
+    Only the trades of the user are read, summed per company and day. For games
+    whose results are not stored yet.
+    """
+    profits = {id: 0 for id in game_ids}
+    if not game_ids:
+        return profits
+    rows = (await db.execute(select(Company.id, Company.price_path).where(Company.game_id.in_(game_ids)))).all()
+    paths: Dict[int, List[int]] = {id: path for id, path in rows if path is not None}
+    missing = [id for id, path in rows if path is None]
+    if missing:
+        # Paths not stored yet are computed from the events, as by Company.visible_prices
+        companies = await db.scalars(
+            select(Company).options(selectinload(Company.events)).where(Company.id.in_(missing))
+        )
+        paths.update((c.id, c.compute_price_path()) for c in companies)
+    totals = await db.execute(
+        select(Trade.game_id, Trade.company_id, Trade.day, func.sum(Trade.amount))
+        .where((Trade.user_id == user_id) & Trade.game_id.in_(game_ids))
+        .group_by(Trade.game_id, Trade.company_id, Trade.day)
+    )
+    for game_id, company_id, day, amount in totals:
+        path = paths[company_id]
+        profits[game_id] += (path[-1] - path[day]) * amount
+    return profits
+
+
+async def get_ticking_games_async(db: AsyncSession) -> List[Row]:
+    """(id, started_at, ticked_day) of started games with transitions left, up to the market close"""
+    # Spelled as the predicate of ix_games_ticking, a bound parameter would not match it
+    query = select(Game.id, Game.started_at, Game.ticked_day).where(
+        Game.closes_at.is_not(None), text("games.ticked_day < 8")
+    )
+    return list((await db.execute(query)).all())
+
+
+async def claim_market_day_async(db: AsyncSession, game_id: int, day: int) -> bool:
+    """Marks the day of the game as ticked. Conditional, so only one claim of a day succeeds."""
+    result = await db.execute(update(Game).where((Game.id == game_id) & (Game.ticked_day < day)).values(ticked_day=day))
+    await db.commit()
+    return result.rowcount == 1  # type: ignore
+
+
+async def release_market_day_async(db: AsyncSession, game_id: int, day: int):
+    """Undoes the claim of a day, so its transition is scheduled again"""
+    await db.execute(update(Game).where((Game.id == game_id) & (Game.ticked_day == day)).values(ticked_day=day - 1))
+    await db.commit()
+
+
+async def get_game_by_id_async(db: AsyncSession, id: int, profile: str = "game") -> Optional[Game]:
+    result = await db.scalars(select(Game).options(*LOAD_PROFILES[profile]).where(Game.id == id))
+    return result.one_or_none()
+
+
+async def get_or_create_user_async(
+    db: AsyncSession,
+    nickname: str,
+    password: str,
+) -> Optional[User]:
+    user = await db.scalar(select(User).where(User.nickname == nickname))
+    if user is not None:
+        # bcrypt is deliberately slow, keep it off the event loop
+        if await asyncio.to_thread(bcrypt.checkpw, password.encode("utf-8"), user.password.encode("utf-8")):
+            return user
+        return None
+    else:
+        hash = await asyncio.to_thread(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt())
+        new_user = User(
+            nickname=nickname,
+            password=hash.decode("utf-8"),
+            gold=INITIAL_GOLD,
+        )
+        db.add(new_user)
+        await db.commit()
+        return new_user
+
+
+async def get_user_by_id_async(db: AsyncSession, id: int) -> Optional[User]:
+    return await db.get(User, id)
+
+
+async def get_rankings_async(db: AsyncSession, offset: int = 0, limit: int = 10) -> List[User]:
+    result = await db.scalars(select(User).order_by(User.gold.desc(), User.id).offset(offset).limit(limit))
+    return list(result.all())
+
+
+# Users rank by gold, ties broken by id, the order of ix_users_gold_id. Ranks and
+# neighbours are read off that index, counting only the users ranked above.
+def _ranked_above(user: User):
+    return or_(User.gold > user.gold, and_(User.gold == user.gold, User.id < user.id))
+
+
+def _ranked_below(user: User):
+    return or_(User.gold < user.gold, and_(User.gold == user.gold, User.id > user.id))
+
+
+async def get_rank_async(db: AsyncSession, user: User) -> int:
+    return (await db.scalar(select(func.count()).select_from(User).where(_ranked_above(user))) or 0) + 1
+
+
+async def get_users_around_async(db: AsyncSession, user: User, radius: int) -> List[User]:
+    above = await db.scalars(
+        select(User).where(_ranked_above(user)).order_by(User.gold.asc(), User.id.desc()).limit(radius)
+    )
+    below = await db.scalars(
+        select(User).where(_ranked_below(user)).order_by(User.gold.desc(), User.id.asc()).limit(radius)
+    )
+    return list(reversed(above.all())) + [user] + list(below.all())
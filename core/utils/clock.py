@@ -0,0 +1,55 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from pytz import utc
+
+if TYPE_CHECKING:
+    from core.entities.schema.game import Company, Event
+
+# Market schedule, one event per day
+DAYS = 7
+DAY_LENGTH = timedelta(minutes=1)
+# Trading stays open for a while after the last event
+MARKET_HOURS = timedelta(minutes=2 * 8)
+
+
+class MarketClock:
+    """Snapshot of the market time, captured once per request.
+
+    Event visibility is memoized per company, so every read within a request
+    sees the same day regardless of when it happens.
+    """
+
+    def __init__(self, now: Optional[datetime] = None):
+        self.now = now or datetime.now(utc)
+        self._visible: Dict[int, int] = {}
+
+    def visible_count(self, company: "Company") -> int:
+        key = id(company)
+        if key not in self._visible:
+            if not company.game.started:
+                self._visible[key] = 0
+            else:
+                # Events are ordered by day, and so are their happen_at times
+                times = [e.happen_at for e in company.events]
+                self._visible[key] = bisect_left(times, self.now)
+        return self._visible[key]
+
+    def visible_events(self, company: "Company") -> List["Event"]:
+        count = self.visible_count(company)
+        # Avoid loading events at all for games that have not started
+        return company.events[:count] if count > 0 else []
+
+    def visible_day(self, started_at: Optional[datetime]) -> int:
+        """Days passed since the game started, following the schedule without loading events"""
+        if started_at is None:
+            return 0
+        return sum(1 for d in range(1, DAYS + 1) if started_at + DAY_LENGTH * d < self.now)
+
+    def ms_left(self, e: "Event") -> int:
+        return max(int((e.happen_at - self.now).total_seconds() * 1000), 0)
+
+
+def get_market_clock() -> MarketClock:
+    return MarketClock()
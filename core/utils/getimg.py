@@ -1,3 +1,7 @@
+import asyncio
+import random
+from typing import Optional
+
 import aiohttp
 
 from pydantic import BaseModel
@@ -6,6 +10,9 @@ from core.config import config
 
 URL = "https://api.getimg.ai/v1/flux-schnell/text-to-image"
 
+# Responses worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 
 class GetImgResponse(BaseModel):
     cost: float
@@ -13,25 +20,99 @@ class GetImgResponse(BaseModel):
     image: str
 
 
+class GetImgException(Exception):
+    pass
+
+
+class GetImgClient:
+    """Long-lived client for the getimg API.
+
+    Connections are kept alive in a shared pool, in-flight generations are
+    capped by a semaphore, and each attempt has its own deadline. Rate limits
+    and server errors are retried with jittered exponential backoff, or after
+    their Retry-After, both capped at max_backoff seconds. Backing off does not
+    hold a slot of the semaphore.
+    """
+
+    def __init__(
+        self,
+        url: str = URL,
+        api_key: str = "",
+        max_concurrency: int = 5,
+        timeout: float = 60,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+        pool_size: int = 10,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "accept": "application/json",
+                    "content-type": "application/json",
+                    "authorization": f"Bearer {self.api_key}",
+                },
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def generate_image(self, prompt: str) -> GetImgResponse:
+        payload = {
+            "prompt": prompt,
+            "steps": 4,
+            "output_format": "jpeg",
+            "response_format": "b64",
+            "width": 512,
+            "height": 512,
+        }
+        await self.start()
+        assert self._session is not None
+
+        for attempt in range(self.retries + 1):
+            retry_after: Optional[float] = None
+            async with self._semaphore:
+                try:
+                    async with self._session.post(self.url, json=payload) as resp:
+                        if resp.ok:
+                            body = await resp.json()
+                            return GetImgResponse(**body)
+                        if resp.status not in RETRY_STATUSES or attempt == self.retries:
+                            raise GetImgException(f"Failed to generate img {resp.status} {resp.reason}")
+                        if resp.headers.get("retry-after", "").isdigit():
+                            retry_after = float(resp.headers["retry-after"])
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if attempt == self.retries:
+                        raise GetImgException(f"Failed to generate img {e!r}") from e
+            delay = self.backoff * (2**attempt) * random.uniform(0.5, 1.5)
+            await asyncio.sleep(min(retry_after if retry_after is not None else delay, self.max_backoff))
+        raise GetImgException("Failed to generate img")
+
+
+getimg_client = GetImgClient(
+    url=config.getimgai_url or URL,
+    api_key=config.getimgai_key,
+    max_concurrency=config.getimgai_concurrency,
+    timeout=config.getimgai_timeout,
+    retries=config.getimgai_retries,
+)
+
+
 async def generate_image(prompt: str) -> GetImgResponse:
-    payload = {
-        "prompt": prompt,
-        "steps": 4,
-        "output_format": "jpeg",
-        "response_format": "b64",
-        "width": 512,
-        "height": 512,
-    }
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Bearer {config.getimgai_key}",
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.post(URL, json=payload, headers=headers) as resp:
-            if resp.ok:
-                body = await resp.json()
-                return GetImgResponse(**body)
-            else:
-                raise Exception(f"Failed to generate img {resp.reason}")
+    return await getimg_client.generate_image(prompt)
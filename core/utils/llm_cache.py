@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+class LLMCache:
+    """Local disk cache of chat completion contents.
+
+    Entries are keyed by the model, the language and the whitespace-normalized
+    messages. They expire after ttl seconds and the least recently used ones are
+    evicted past max_entries. A hit is only served with probability reuse_rate,
+    otherwise the completion is generated again and replaces the entry, so
+    repeated themes still get some variety.
+    """
+
+    def __init__(self, directory: str, ttl: float, max_entries: int, reuse_rate: float = 1.0):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.reuse_rate = reuse_rate
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(model: str, language: str, messages: Iterable[Mapping[str, Any]]) -> str:
+        normalized = [(m["role"], " ".join(str(m.get("content") or "").split())) for m in messages]
+        raw = json.dumps([model, language.strip().lower(), normalized], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        if random.random() >= self.reuse_rate:
+            self.skipped += 1
+            return None
+        content = await asyncio.to_thread(self._get, key)
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    async def put(self, key: str, content: str):
+        await asyncio.to_thread(self._put, key, content)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.skipped
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups > 0 else None,
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if time.time() - entry["created_at"] > self.ttl:
+                os.remove(path)
+                return None
+            # mtime tracks the last use, for LRU eviction
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Missing, or expired or evicted concurrently
+            return None
+        return entry["content"]
+
+    def _put(self, key: str, content: str):
+        path = self._path(key)
+        # Unique to the writer, as concurrent misses of one key put the same entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created_at": time.time(), "content": content}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        entries: List[Tuple[float, str]] = []
+        for e in os.scandir(self.directory):
+            if not e.name.endswith(".json"):
+                continue
+            try:
+                entries.append((e.stat().st_mtime, e.path))
+            except FileNotFoundError:
+                pass
+        if len(entries) > self.max_entries:
+            entries.sort()
+            for _, entry_path in entries[: len(entries) - self.max_entries]:
+                try:
+                    os.remove(entry_path)
+                    self.evictions += 1
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,48 @@
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+HEADER = "X-DB-Queries"
+
+# A list rather than an int, so increments made in the thread pool or in
+# SQLAlchemy's greenlets, which run on copies of the context, stay visible
+_queries: ContextVar[Optional[List[int]]] = ContextVar("db_queries", default=None)
+
+
+def _on_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def count_queries(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _on_execute):
+        event.listen(engine, "before_cursor_execute", _on_execute)
+
+
+class QueryCountMiddleware:
+    """Reports the statements each request executed in the X-DB-Queries response header"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = [0]
+        token = _queries.set(counter)
+
+        async def send_with_count(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(HEADER, str(counter[0]))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _queries.reset(token)
@@ -0,0 +1,225 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from typing import List, Optional, Sequence, Set, Tuple
+
+from PIL import Image, UnidentifiedImageError
+
+JPEG_SOI = b"\xff\xd8\xff"
+JPEG_EOI = b"\xff\xd9"
+
+# Maps prompt hashes to the file generated for them
+INDEX_DIR = ".prompts"
+
+# Originals are named <content hash>.jpg and their variants <content hash>_<size>.<format>
+CONTENT_NAME = re.compile(r"[0-9a-f]{32}(_[0-9]+)?\.[a-z]+")
+
+
+class ThumbnailException(Exception):
+    pass
+
+
+def is_jpeg(data: bytes) -> bool:
+    return data.startswith(JPEG_SOI) and data.rstrip(b"\x00").endswith(JPEG_EOI)
+
+
+def to_jpeg(data: bytes) -> bytes:
+    """Returns the image as JPEG bytes, re-encoding only when it is not one already"""
+    if is_jpeg(data):
+        return data
+    try:
+        img = Image.open(BytesIO(data))
+        out = BytesIO()
+        img.convert("RGB").save(out, "JPEG")
+    except (UnidentifiedImageError, OSError) as e:
+        raise ThumbnailException(f"Invalid thumbnail image: {e}") from e
+    return out.getvalue()
+
+
+def supported_formats(formats: Sequence[str]) -> List[str]:
+    """Variant formats the installed PIL can encode, AVIF needing a recent build"""
+    Image.init()
+    return [fmt for fmt in formats if fmt.upper() in Image.SAVE]
+
+
+def variant_name(fname: str, size: int, fmt: str) -> str:
+    return f"{os.path.splitext(fname)[0]}_{size}.{fmt}"
+
+
+def make_variants(data: bytes, sizes: Sequence[int], formats: Sequence[str]) -> List[Tuple[int, str, bytes]]:
+    """Downscales the image into every (size, format) pair"""
+    img = Image.open(BytesIO(data)).convert("RGB")
+    variants = []
+    for size in sizes:
+        resized = img.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for fmt in formats:
+            out = BytesIO()
+            resized.save(out, fmt.upper(), quality=80)
+            variants.append((size, fmt, out.getvalue()))
+    return variants
+
+
+def hash_prompt(prompt: str) -> str:
+    return hashlib.sha256(" ".join(prompt.split()).encode("utf-8")).hexdigest()
+
+
+def hash_content(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def is_content_named(fname: str) -> bool:
+    """Whether the file is named after its content, and so never changes"""
+    return CONTENT_NAME.fullmatch(fname) is not None
+
+
+def write_atomic(fpath: str, data: bytes):
+    # Written aside and renamed, so a file being served is never partial. The temporary
+    # file is unique to the writer, as identical content from concurrent ones lands on one path,
+    # and hidden, so it is neither served nor collected.
+    directory, fname = os.path.split(fpath)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{fname}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, fpath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class ThumbnailWriter:
+    """Content-addressed thumbnail store.
+
+    Files are named after the hash of their bytes, so identical images are
+    stored once, and an index keyed by prompt hash lets repeated prompts skip
+    generation. Each image is also stored downscaled in every configured size and
+    format. Decoding and disk access run in a worker pool, off the event loop.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sizes: Sequence[int] = (),
+        formats: Sequence[str] = (),
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.directory = directory
+        self.sizes = list(sizes)
+        self.formats = supported_formats(formats)
+        self._executor = executor or ThreadPoolExecutor(max_workers=4, thread_name_prefix="thumbnail")
+
+        os.makedirs(os.path.join(directory, INDEX_DIR), exist_ok=True)
+
+    async def lookup(self, prompt: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._lookup, prompt)
+
+    async def write(self, b64_image: str, prompt: Optional[str] = None) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._write, b64_image, prompt)
+
+    def _index_path(self, prompt: str) -> str:
+        return os.path.join(self.directory, INDEX_DIR, hash_prompt(prompt))
+
+    def _lookup(self, prompt: str) -> Optional[str]:
+        try:
+            with open(self._index_path(prompt), "r") as f:
+                fname = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return fname if os.path.exists(os.path.join(self.directory, fname)) else None
+
+    def _write(self, b64_image: str, prompt: Optional[str]) -> str:
+        try:
+            data = base64.b64decode(b64_image, validate=True)
+        except binascii.Error as e:
+            raise ThumbnailException(f"Invalid thumbnail encoding: {e}") from e
+        data = to_jpeg(data)
+
+        fname = f"{hash_content(data)}.jpg"
+        fpath = os.path.join(self.directory, fname)
+        if not os.path.exists(fpath):
+            write_atomic(fpath, data)
+        else:
+            # Refresh mtime, so garbage collection treats it as new
+            os.utime(fpath)
+        wanted = [(size, fmt) for size in self.sizes for fmt in self.formats]
+        if any(not os.path.exists(os.path.join(self.directory, variant_name(fname, *v))) for v in wanted):
+            for size, fmt, variant in make_variants(data, self.sizes, self.formats):
+                write_atomic(os.path.join(self.directory, variant_name(fname, size, fmt)), variant)
+        if prompt is not None:
+            write_atomic(self._index_path(prompt), fname.encode("utf-8"))
+        return fname
+
+
+def list_variants(
+    directory: str,
+    fname: str,
+    sizes: Tuple[int, ...],
+    formats: Tuple[str, ...],
+) -> Tuple[Tuple[str, int, str], ...]:
+    """Variants stored for a thumbnail as (file, size, format)"""
+    # Keyed by the directory mtime, which changes whenever a file is written or removed in it
+    return _list_variants(directory, os.stat(directory).st_mtime_ns, fname, sizes, formats)
+
+
+@lru_cache(maxsize=4096)
+def _list_variants(
+    directory: str,
+    mtime: int,
+    fname: str,
+    sizes: Tuple[int, ...],
+    formats: Tuple[str, ...],
+) -> Tuple[Tuple[str, int, str], ...]:
+    return tuple(
+        (variant_name(fname, size, fmt), size, fmt)
+        for size in sizes
+        for fmt in formats
+        if os.path.exists(os.path.join(directory, variant_name(fname, size, fmt)))
+    )
+
+
+def collect_garbage(directory: str, referenced: Set[str], grace: float = 3600, dry_run: bool = False) -> List[str]:
+    """Removes thumbnails no company references, with their variants and index entries.
+
+    Files modified within the grace period (seconds) are kept, as they may belong
+    to a game still being generated.
+    """
+    removed: List[str] = []
+    cutoff = time.time() - grace
+    # Variants are named after their original, <stem>_<size>.<format>
+    stems = {os.path.splitext(fname)[0] for fname in referenced}
+    for entry in os.scandir(directory):
+        if not entry.is_file() or entry.name.startswith("."):
+            continue
+        stem = os.path.splitext(entry.name)[0]
+        if entry.name in referenced or stem.rsplit("_", 1)[0] in stems or entry.stat().st_mtime > cutoff:
+            continue
+        removed.append(entry.name)
+        if not dry_run:
+            os.remove(entry.path)
+
+    index_dir = os.path.join(directory, INDEX_DIR)
+    if not dry_run and os.path.isdir(index_dir):
+        for entry in os.scandir(index_dir):
+            if entry.name.startswith("."):
+                continue
+            with open(entry.path, "r") as f:
+                fname = f.read().strip()
+            if not os.path.exists(os.path.join(directory, fname)):
+                os.remove(entry.path)
+    if removed and not dry_run:
+        _list_variants.cache_clear()
+    return removed
@@ -0,0 +1,24 @@
+import argparse
+
+from core.config import config
+from core.entities.schema.db import SessionLocal
+from core.entities.schema.game import Company
+from core.utils.logger import logger
+from core.utils.thumbnail import collect_garbage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove thumbnails no company references")
+    parser.add_argument("--grace", type=float, default=3600, help="Keep files modified within these seconds")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        referenced = {t for (t,) in db.query(Company.thumbnail).distinct()}
+
+    removed = collect_garbage(config.thumbnails_path, referenced, grace=args.grace, dry_run=args.dry_run)
+    logger.info(f"{'Would remove' if args.dry_run else 'Removed'} {len(removed)} thumbnails")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+def pytest_benchmark_update_json(config, benchmarks, output_json):
+    # Raw samples would make the committed baseline unreviewable, the summary is kept
+    for bench in output_json["benchmarks"]:
+        bench["stats"].pop("data", None)
@@ -0,0 +1,134 @@
+import asyncio
+import base64
+import itertools
+import json
+import random
+from dataclasses import dataclass
+from io import BytesIO
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from PIL import Image
+
+
+@dataclass
+class LatencyProfile:
+    """Response time and faults of a stand-in server.
+
+    Each request takes latency seconds, give or take jitter. A slow_rate share of
+    them takes slow_factor times longer, and an error_rate share fails with a 500.
+    """
+
+    latency: float = 0.02
+    jitter: float = 0.0
+    slow_rate: float = 0.0
+    slow_factor: float = 10.0
+    error_rate: float = 0.0
+
+    def delay(self) -> float:
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        if random.random() < self.slow_rate:
+            delay *= self.slow_factor
+        return delay
+
+    def fails(self) -> bool:
+        return random.random() < self.error_rate
+
+
+def make_image() -> str:
+    img = Image.new("RGB", (64, 64), (random.randrange(256), random.randrange(256), random.randrange(256)))
+    out = BytesIO()
+    img.save(out, "JPEG")
+    return base64.b64encode(out.getvalue()).decode("ascii")
+
+
+class FakeOpenAI:
+    """Chat completions stand-in, answering the company and event prompts of GameService"""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self.requests = 0
+        self._ids = itertools.count()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.requests += 1
+        await asyncio.sleep(self.profile.delay())
+        if self.profile.fails():
+            return web.json_response({"error": {"message": "stand-in failure"}}, status=500)
+
+        prompt = body["messages"][0]["content"]
+        content = self.companies() if "imaginary companies" in prompt else self.events()
+        return web.json_response(
+            {
+                "id": f"chatcmpl-{next(self._ids)}",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": json.dumps(content)},
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+        )
+
+    def companies(self):
+        # Unique names, so thumbnail prompts never hit the prompt index
+        n = next(self._ids)
+        return {
+            "title": f"Benchmark {n}",
+            "companies": [
+                {
+                    "name": f"Company {n}-{i}",
+                    "description": "Makes things",
+                    "name_en": f"Company {n}-{i}",
+                    "description_en": "Makes things",
+                    "price": random.randint(100, 1000),
+                }
+                for i in range(5)
+            ],
+        }
+
+    def events(self):
+        return {
+            "events": [
+                {"company": f"Company {i}", "description": "Something happened", "price": random.randint(-50, 50)}
+                for i in range(5)
+            ]
+        }
+
+
+class FakeGetImg:
+    """getimg text-to-image stand-in, returning a small random JPEG"""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        await request.json()
+        self.requests += 1
+        await asyncio.sleep(self.profile.delay())
+        if self.profile.fails():
+            return web.Response(status=500)
+        return web.json_response({"cost": 0.0, "seed": 1, "image": make_image()})
+
+
+async def serve(app: web.Application) -> TestServer:
+    server = TestServer(app)
+    await server.start_server()
+    return server
@@ -0,0 +1,89 @@
+"""Micro-benchmarks of the domain hot paths on synthetic in-memory games.
+
+    RUN_BENCHMARKS=1 python -m pytest tests/benchmark/test_domain.py
+
+make bench-baseline rewrites tests/benchmark/domain_baseline.json, so changes
+in these timings show up in review.
+"""
+
+import os
+import random
+from datetime import datetime
+from typing import Dict, Tuple
+
+import pytest
+from pytz import utc
+
+from app.services.game_service import GameService
+from core.entities.dto.convert import game_to_dto
+from core.entities.schema.game import Company, Event, Game, Position, Trade, User
+from core.utils.clock import DAY_LENGTH, DAYS, MarketClock
+
+pytestmark = pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run")
+
+# (players, trades)
+SCALES = [(5, 50), (50, 5_000), (500, 100_000)]
+COMPANIES = 5
+
+STARTED_AT = datetime(2026, 1, 1, tzinfo=utc)
+# Mid-week, with some events still hidden, and after the close
+MIDWEEK = STARTED_AT + DAY_LENGTH * 3.5
+CLOSED = STARTED_AT + DAY_LENGTH * (DAYS + 1)
+
+
+def make_game(players: int, trades: int) -> Game:
+    """A started game with random trades, built without a database"""
+    rng = random.Random(players * trades)
+    game = Game(id=1, language="en", theme="Benchmark", owner_id=1, started_at=STARTED_AT)
+    for c in range(COMPANIES):
+        company = Company(id=c + 1, name=f"Company {c}", description="", price=rng.randint(100, 1000), thumbnail="")
+        for d in range(DAYS):
+            happen_at = STARTED_AT + DAY_LENGTH * (d + 1)
+            company.events.append(
+                Event(id=c * DAYS + d + 1, day=d + 1, description="", price=rng.randint(-50, 50), happen_at=happen_at)
+            )
+        company.compute_price_path()
+        game.companies.append(company)
+
+    game.users = [User(id=u + 1, nickname=f"user-{u}", password="", gold=10_000) for u in range(players)]
+
+    positions: Dict[Tuple[int, int], int] = {}
+    game.trades = []
+    for _ in range(trades):
+        user_id, company_id = rng.randint(1, players), rng.randint(1, COMPANIES)
+        amount, day = rng.randint(-5, 10), rng.randint(0, DAYS)
+        game.trades.append(Trade(user_id=user_id, game_id=1, company_id=company_id, day=day, amount=amount))
+        positions[(user_id, company_id)] = positions.get((user_id, company_id), 0) + amount
+    game.positions = [
+        Position(game_id=1, user_id=user_id, company_id=company_id, amount=amount)
+        for (user_id, company_id), amount in positions.items()
+    ]
+    return game
+
+
+@pytest.fixture(scope="module", params=SCALES, ids=[f"{p}p-{t}t" for p, t in SCALES])
+def game(request) -> Game:
+    return make_game(*request.param)
+
+
+def test_visible_prices(benchmark, game: Game):
+    # A fresh clock per round, as every request gets its own snapshot
+    benchmark(lambda: [c.visible_prices(MarketClock(MIDWEEK)) for c in game.companies])
+
+
+def test_visible_events(benchmark, game: Game):
+    benchmark(lambda: [c.visible_events(MarketClock(MIDWEEK)) for c in game.companies])
+
+
+def test_get_holdings(benchmark, game: Game):
+    user = game.users[len(game.users) // 2]
+    benchmark(game.get_holdings, user)
+
+
+def test_get_game_result(benchmark, game: Game):
+    service = GameService()
+    benchmark(lambda: service.get_game_result(game, MarketClock(CLOSED)))
+
+
+def test_game_to_dto(benchmark, game: Game):
+    benchmark(lambda: game_to_dto(game, MarketClock(MIDWEEK)))
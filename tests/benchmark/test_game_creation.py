@@ -0,0 +1,189 @@
+"""End-to-end benchmark of game creation against local OpenAI and getimg stand-ins.
+
+Runs the POST /game/ pipeline (content generation, then persistence) at several
+concurrency levels and reports p50/p95/p99 per stage. Each stage fails when its
+p95 exceeds the budget derived from the stand-in latencies, or the baseline
+given in BENCH_BASELINE, by more than BENCH_TOLERANCE.
+
+    RUN_BENCHMARKS=1 python -m pytest -s tests/benchmark
+
+The database is a temporary SQLite file, or BENCH_DATABASE_URL (an async URL,
+e.g. postgresql+asyncpg://... to a Postgres container).
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Dict, List
+
+import pytest
+from openai import AsyncOpenAI
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.services.game_service import GameService
+from core.config import config
+from core.entities.schema.db import Base
+from core.entities.schema.game import User, create_game_async
+from core.utils.getimg import GetImgClient
+from core.utils.thumbnail import ThumbnailWriter
+from stand_ins import FakeGetImg, FakeOpenAI, LatencyProfile, serve
+
+pytestmark = pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run")
+
+STAGES = ["companies", "thumbnails", "events", "persistence", "total"]
+CONCURRENCY = [1, 4, 16]
+# Games created one after another by each concurrent client
+ROUNDS = 3
+
+OPENAI_PROFILE = LatencyProfile(latency=0.05, jitter=0.01)
+GETIMG_PROFILE = LatencyProfile(latency=0.2, jitter=0.05)
+
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "0.5"))
+# Seconds allowed on top of every budget, for local I/O and scheduling
+SLACK = 0.25
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    return {stage: {f"p{p}": percentile(samples[stage], p) for p in (50, 95, 99)} for stage in STAGES if samples[stage]}
+
+
+def budgets(concurrency: int) -> Dict[str, float]:
+    """Expected worst-case seconds per stage, from the stand-in latencies"""
+    chat = OPENAI_PROFILE.latency + OPENAI_PROFILE.jitter
+    image = GETIMG_PROFILE.latency + GETIMG_PROFILE.jitter
+    # Every game asks for 5 images at once, through the client's concurrency cap
+    image_waves = math.ceil(concurrency * 5 / config.getimgai_concurrency)
+    expected = {
+        "companies": chat,
+        "thumbnails": image_waves * image,
+        "events": 7 * chat,
+        "persistence": 0.0,
+    }
+    expected["total"] = expected["companies"] + max(expected["thumbnails"], expected["events"])
+    return expected
+
+
+class Harness:
+    def __init__(self, tmp_path, openai_profile: LatencyProfile, getimg_profile: LatencyProfile):
+        self.tmp_path = tmp_path
+        self.fake_openai = FakeOpenAI(openai_profile)
+        self.fake_getimg = FakeGetImg(getimg_profile)
+
+    async def run(self, levels: List[int]) -> Dict[int, Dict[str, List[float]]]:
+        openai_server = await serve(self.fake_openai.app())
+        getimg_server = await serve(self.fake_getimg.app())
+        image_client = GetImgClient(
+            url=str(getimg_server.make_url("/")),
+            max_concurrency=config.getimgai_concurrency,
+            backoff=0.05,
+        )
+        service = GameService(
+            openai_client=AsyncOpenAI(api_key="benchmark", base_url=str(openai_server.make_url("/v1"))),
+            image_client=image_client,
+            thumbnail_writer=ThumbnailWriter(
+                str(self.tmp_path / "thumbnails"),
+                sizes=config.thumbnail_sizes,
+                formats=config.thumbnail_formats,
+            ),
+        )
+        service.llm_cache = None
+
+        url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite+aiosqlite:///{self.tmp_path / 'benchmark.db'}"
+        engine = create_async_engine(url)
+        sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+            async with sessions() as db:
+                owner = User(nickname="benchmark", password="", gold=10000)
+                db.add(owner)
+                await db.commit()
+
+            results = {}
+            for concurrency in levels:
+                samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+                await asyncio.gather(*[self.client(service, sessions, owner.id, samples) for _ in range(concurrency)])
+                results[concurrency] = samples
+            return results
+        finally:
+            if os.environ.get("BENCH_DATABASE_URL"):
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.drop_all)
+            await engine.dispose()
+            await image_client.close()
+            await openai_server.close()
+            await getimg_server.close()
+
+    async def client(self, service: GameService, sessions, owner_id: int, samples: Dict[str, List[float]]):
+        for _ in range(ROUNDS):
+            timings: Dict[str, float] = {}
+            started = time.perf_counter()
+            companies, title = await service.create_game_content("Benchmark", "en", timings)
+
+            persisted = time.perf_counter()
+            async with sessions() as db:
+                owner = await db.get(User, owner_id)
+                await create_game_async(db, title, owner, companies, "en")
+            timings["persistence"] = time.perf_counter() - persisted
+            timings["total"] = time.perf_counter() - started
+
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+
+
+def report(results: Dict[int, Dict[str, Dict[str, float]]]):
+    print()
+    print(f"{'clients':>8} {'stage':<12} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for concurrency, stages in results.items():
+        for stage, ps in stages.items():
+            print(f"{concurrency:>8} {stage:<12} {ps['p50']:>8.3f} {ps['p95']:>8.3f} {ps['p99']:>8.3f}")
+
+
+def test_game_creation_latency(tmp_path):
+    harness = Harness(tmp_path, OPENAI_PROFILE, GETIMG_PROFILE)
+    samples = asyncio.run(harness.run(CONCURRENCY))
+    results = {concurrency: summarize(s) for concurrency, s in samples.items()}
+    report(results)
+
+    if os.environ.get("BENCH_OUTPUT"):
+        with open(os.environ["BENCH_OUTPUT"], "w") as f:
+            json.dump({str(c): stages for c, stages in results.items()}, f, indent=2)
+
+    baseline = None
+    if os.environ.get("BENCH_BASELINE"):
+        with open(os.environ["BENCH_BASELINE"], "r") as f:
+            baseline = json.load(f)
+
+    regressions = []
+    for concurrency, stages in results.items():
+        expected = budgets(concurrency)
+        for stage, ps in stages.items():
+            if baseline is not None:
+                budget = baseline[str(concurrency)][stage]["p95"] * (1 + TOLERANCE)
+            else:
+                budget = expected[stage] * (1 + TOLERANCE) + SLACK
+            if ps["p95"] > budget:
+                regressions.append(f"{stage} at {concurrency} clients: p95 {ps['p95']:.3f}s > {budget:.3f}s")
+    assert not regressions, "\n".join(regressions)
+
+
+def test_game_creation_survives_faults(tmp_path):
+    # Retries absorb the errors, at the cost of latency
+    harness = Harness(
+        tmp_path,
+        LatencyProfile(latency=0.05, jitter=0.01, slow_rate=0.05),
+        LatencyProfile(latency=0.2, jitter=0.05, slow_rate=0.05, error_rate=0.1),
+    )
+    samples = asyncio.run(harness.run([4]))
+    report({4: summarize(samples[4])})
+
+    assert len(samples[4]["total"]) == 4 * ROUNDS
+    assert harness.fake_getimg.requests > 4 * ROUNDS * 5
@@ -0,0 +1,67 @@
+import os
+from datetime import datetime
+from typing import Callable
+
+import pytest
+from pytz import utc
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+
+from core.config import to_async_url
+from core.entities.schema.db import Base
+from core.entities.schema.game import Company, Event, Game, User
+from core.utils.clock import DAY_LENGTH
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{tmp_path / 'trades.db'}")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def sessions(engine) -> sessionmaker:
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def async_sessions(engine) -> async_sessionmaker:
+    # Not pooled, as each test runs its own event loop
+    async_engine = create_async_engine(to_async_url(engine.url.render_as_string(False)), poolclass=NullPool)
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def make_game() -> Callable[[Session, int], Game]:
+    """Builds a game started two days ago, with flat prices of 100 and players holding 10 000 gold"""
+
+    def make(db: Session, players: int) -> Game:
+        started_at = datetime.now(utc) - DAY_LENGTH * 2
+        users = [User(nickname=f"trader-{i}", password="", gold=10_000) for i in range(players)]
+        companies = []
+        for c in range(5):
+            company = Company(name=f"Company {c}", description="", price=100, thumbnail="")
+            for d in range(7):
+                happen_at = started_at + DAY_LENGTH * (d + 1)
+                company.events.append(Event(day=d + 1, description="", price=0, happen_at=happen_at))
+            company.compute_price_path()
+            companies.append(company)
+        game = Game(
+            language="en",
+            theme="Trading",
+            companies=companies,
+            users=users,
+            started_at=started_at,
+            closes_at=started_at + DAY_LENGTH * 7,
+        )
+        db.add(game)
+        db.commit()
+        return game
+
+    return make
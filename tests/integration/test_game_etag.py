@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Response
+from pytz import utc
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from api.game.game import get_game, join_game
+from core.entities.schema.game import Trade, User, create_trades
+from core.utils.clock import DAY_LENGTH, MarketClock
+
+
+def fetch(async_sessions: async_sessionmaker, game_id: int, etag: Optional[str] = None, clock=None) -> Response:
+    headers = [] if etag is None else [(b"if-none-match", etag.encode())]
+
+    async def run():
+        async with async_sessions() as db:
+            return await get_game(game_id, Request({"type": "http", "headers": headers}), db, clock or MarketClock())
+
+    return asyncio.run(run())
+
+
+def test_unchanged_game_is_not_modified(sessions: sessionmaker, async_sessions: async_sessionmaker, make_game):
+    with sessions() as db:
+        game_id = make_game(db, players=1).id
+
+    response = fetch(async_sessions, game_id)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = fetch(async_sessions, game_id, etag)
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.body == b""
+
+
+def test_etag_changes_with_a_trade(sessions: sessionmaker, async_sessions: async_sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=1)
+        game_id, user_id, company_id = game.id, game.users[0].id, game.companies[0].id
+    etag = fetch(async_sessions, game_id).headers["etag"]
+
+    with sessions() as db:
+        create_trades(db, [Trade(user_id=user_id, game_id=game_id, company_id=company_id, day=2, amount=1)])
+
+    response = fetch(async_sessions, game_id, etag)
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_etag_changes_with_a_join(sessions: sessionmaker, async_sessions: async_sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=1)
+        game.started_at = None
+        db.add(User(nickname="joiner", password="", gold=10_000))
+        db.commit()
+        game_id = game.id
+        joiner_id = db.query(User.id).where(User.nickname == "joiner").scalar()
+    etag = fetch(async_sessions, game_id).headers["etag"]
+
+    with sessions() as db:
+        join_game(game_id, db, MarketClock(), joiner_id)
+
+    response = fetch(async_sessions, game_id, etag)
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_etag_changes_with_the_day(sessions: sessionmaker, async_sessions: async_sessionmaker, make_game):
+    with sessions() as db:
+        game_id = make_game(db, players=1).id
+    now = datetime.now(utc)
+    etag = fetch(async_sessions, game_id, clock=MarketClock(now)).headers["etag"]
+
+    # Same day, same state
+    response = fetch(async_sessions, game_id, etag, clock=MarketClock(now))
+    assert response.status_code == 304
+
+    response = fetch(async_sessions, game_id, etag, clock=MarketClock(now + DAY_LENGTH))
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,42 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import api.game.game
+from api.game.game import get_game_feed
+from core.utils.clock import MarketClock
+
+
+@pytest.fixture(autouse=True)
+def feed_sessions(monkeypatch, async_sessions: async_sessionmaker):
+    monkeypatch.setattr(api.game.game, "AsyncSessionLocal", async_sessions)
+
+
+# Games started before closes_at was stored are told closed by their events
+@pytest.mark.parametrize("closes_at", [True, False], ids=["closes_at", "events"])
+def test_feed_of_a_running_game(sessions: sessionmaker, make_game, closes_at: bool):
+    with sessions() as db:
+        game = make_game(db, players=0)
+        if not closes_at:
+            game.closes_at = None
+            db.commit()
+        game_id, started_at = game.id, game.started_at
+
+    response = asyncio.run(get_game_feed(game_id, MarketClock()))
+    assert isinstance(response, StreamingResponse)
+    assert response.media_type == "text/event-stream"
+
+    with pytest.raises(HTTPException, match="already closed"):
+        asyncio.run(get_game_feed(game_id, MarketClock(started_at + timedelta(minutes=8))))
+
+
+def test_feed_of_a_missing_game(sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game_id = make_game(db, players=0).id
+    with pytest.raises(HTTPException, match="not found"):
+        asyncio.run(get_game_feed(game_id + 1, MarketClock()))
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from api.game.game import get_game
+from core.entities.schema.game import Game, User, claim_pooled_game_async
+from core.utils.clock import MarketClock
+
+KEY = "en:trading"
+
+
+def add_pooled_games(db, count: int):
+    db.add_all([Game(language="en", theme="Trading", pool_key=KEY) for _ in range(count)])
+    db.add_all([User(nickname=f"owner-{i}", password="", gold=10_000) for i in range(2)])
+    db.commit()
+
+
+def claim_concurrently(async_sessions: async_sessionmaker):
+    async def claim(owner_id: int):
+        async with async_sessions() as db:
+            owner = await db.get(User, owner_id)
+            assert owner is not None
+            game = await claim_pooled_game_async(db, KEY, owner)
+            return None if game is None else (game.id, game.owner_id)
+
+    async def run():
+        return await asyncio.gather(claim(1), claim(2))
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("pooled", [1, 2])
+def test_concurrent_claims(sessions: sessionmaker, async_sessions: async_sessionmaker, pooled: int):
+    with sessions() as db:
+        add_pooled_games(db, pooled)
+
+    claims = claim_concurrently(async_sessions)
+    games = [c for c in claims if c is not None]
+    assert len(games) == pooled
+    assert len({game_id for game_id, _ in games}) == pooled
+    assert {owner_id for _, owner_id in games} <= {1, 2}
+
+    with sessions() as db:
+        assert db.query(Game).where(Game.pool_key.is_not(None)).count() == 0
+
+
+def test_pooled_games_are_not_visible(sessions: sessionmaker, async_sessions: async_sessionmaker):
+    with sessions() as db:
+        add_pooled_games(db, 1)
+        game_id = db.query(Game.id).scalar()
+
+    async def run():
+        async with async_sessions() as db:
+            return await get_game(game_id, Request({"type": "http", "headers": []}), db, MarketClock())
+
+    with pytest.raises(HTTPException, match="not found"):
+        asyncio.run(run())
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from core.entities.schema.game import GameResult, get_game_results, get_stored_ranking, save_game_results
+
+THREADS = 8
+
+
+def test_results_are_stored_once(sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=2)
+        game_id, user_ids = game.id, [u.id for u in game.users]
+        assert get_game_results(db, game_id) is None
+
+    def save(i: int) -> bool:
+        with sessions() as db:
+            return save_game_results(db, game_id, {user_ids[0]: i, user_ids[1]: -i})
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        saved = list(pool.map(save, range(THREADS)))
+
+    assert saved.count(True) == 1
+    winner = saved.index(True)
+    with sessions() as db:
+        assert get_game_results(db, game_id) == {user_ids[0]: winner, user_ids[1]: -winner}
+        assert db.scalar(select(func.count()).select_from(GameResult)) == 2
+
+
+def test_results_of_a_game_without_players(sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game_id = make_game(db, players=0).id
+        assert save_game_results(db, game_id, {})
+        assert get_game_results(db, game_id) == {}
+        assert get_game_results(db, game_id + 1) is None
+
+
+def test_ranking_of_stored_results(sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=3)
+        game_id, user_ids = game.id, [u.id for u in game.users]
+        assert get_stored_ranking(db, game_id) is None
+
+        # Ties on profit are broken by user id
+        save_game_results(db, game_id, {user_ids[0]: 5, user_ids[1]: 20, user_ids[2]: 5})
+        ranking = get_stored_ranking(db, game_id)
+        assert ranking is not None
+        assert [(r.user_id, r.profit) for r in ranking] == [(user_ids[1], 20), (user_ids[0], 5), (user_ids[2], 5)]
+        assert ranking[0].nickname == game.users[1].nickname
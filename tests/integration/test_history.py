@@ -0,0 +1,79 @@
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from core.entities.schema.game import Trade, get_closed_games_async, get_final_profits_async
+from core.utils.clock import MarketClock
+
+
+def test_history_is_paged_by_closing(sessions: sessionmaker, async_sessions: async_sessionmaker, make_game):
+    with sessions() as db:
+        games = [make_game(db, players=1 if i == 0 else 0) for i in range(4)]
+        user, closed_at = games[0].users[0], games[0].started_at
+        for i, game in enumerate(games):
+            if game is not games[0]:
+                game.users.append(user)
+            game.closes_at = closed_at - timedelta(minutes=i // 2)
+        # Still trading
+        games[3].closes_at = closed_at + timedelta(days=1)
+        db.commit()
+        user_id, ids = user.id, [g.id for g in games]
+
+    async def pages():
+        async with async_sessions() as db:
+            pages, before = [], None
+            while True:
+                rows = await get_closed_games_async(db, user_id, MarketClock().now, 2, before)
+                if not rows:
+                    return pages
+                pages.append([r.id for r in rows])
+                before = (rows[-1].closes_at, rows[-1].id)
+
+    # Games closed at the same time come newest id first
+    assert asyncio.run(pages()) == [[ids[1], ids[0]], [ids[2]]]
+
+
+def test_final_profits(sessions: sessionmaker, async_sessions: async_sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=2)
+        company = game.companies[0]
+        company.price_path = [100, 110, 120, 130, 140, 150, 160, 170]
+        buyer, other = game.users
+        db.add_all(
+            [
+                Trade(user_id=buyer.id, game_id=game.id, company_id=company.id, day=1, amount=10),
+                Trade(user_id=buyer.id, game_id=game.id, company_id=company.id, day=1, amount=5),
+                Trade(user_id=buyer.id, game_id=game.id, company_id=company.id, day=3, amount=-5),
+                Trade(user_id=other.id, game_id=game.id, company_id=company.id, day=6, amount=1),
+            ]
+        )
+        db.commit()
+        game_id, buyer_id = game.id, buyer.id
+
+    async def profits():
+        async with async_sessions() as db:
+            return await get_final_profits_async(db, buyer_id, [game_id, game_id + 1])
+
+    # 15 bought at 110 and 5 sold at 130, the 10 left are valued at 170
+    assert asyncio.run(profits()) == {game_id: -15 * 110 + 5 * 130 + 10 * 170, game_id + 1: 0}
+
+
+def test_final_profits_without_price_path(sessions: sessionmaker, async_sessions: async_sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=1)
+        company = game.companies[0]
+        for e in company.events:
+            e.price = 10
+        company.price_path = None
+        db.add(Trade(user_id=game.users[0].id, game_id=game.id, company_id=company.id, day=0, amount=1))
+        db.commit()
+        game_id, user_id = game.id, game.users[0].id
+
+    async def profits():
+        async with async_sessions() as db:
+            return await get_final_profits_async(db, user_id, [game_id])
+
+    # Bought at 100, worth 193 after seven days of +10%
+    assert asyncio.run(profits()) == {game_id: 93}
@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from pytz import utc
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from core.entities.schema.game import Game, User, get_game_summaries_async
+
+
+def test_summaries_are_paged_by_creation(sessions: sessionmaker, async_sessions: async_sessionmaker):
+    created_at = datetime(2026, 1, 1, tzinfo=utc)
+    with sessions() as db:
+        users = [User(nickname=f"player-{i}", password="", gold=10_000) for i in range(3)]
+        games = [
+            Game(language="en", theme=f"Game {i}", owner_id=None, created_at=created_at + timedelta(minutes=i // 2))
+            for i in range(5)
+        ]
+        games[4].users = users
+        games[3].users = users[:1]
+        db.add_all(games)
+        # Not in the lobby
+        db.add(Game(language="en", theme="Started", started_at=created_at, created_at=created_at))
+        db.add(Game(language="ko", theme="Korean", created_at=created_at))
+        db.add(Game(language="en", theme="Pooled", pool_key="en:pooled", created_at=created_at))
+        db.commit()
+        games[4].owner_id = users[0].id
+        db.commit()
+
+    async def pages():
+        async with async_sessions() as db:
+            pages, before = [], None
+            while True:
+                rows = await get_game_summaries_async(db, "en", 2, before)
+                if not rows:
+                    return pages
+                pages.append([(r.theme, r.players, r.owner_nickname) for r in rows])
+                before = (rows[-1].created_at, rows[-1].id)
+
+    # Games created at the same time come newest id first
+    assert asyncio.run(pages()) == [
+        [("Game 4", 3, "player-0"), ("Game 3", 1, None)],
+        [("Game 2", 0, None), ("Game 1", 0, None)],
+        [("Game 0", 0, None)],
+    ]
@@ -0,0 +1,100 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import List, Tuple
+
+from pytz import utc
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.services.market_scheduler import MarketScheduler
+from core.entities.schema.game import Game
+from core.utils.clock import DAY_LENGTH, MARKET_HOURS
+
+WORKERS = 3
+
+
+def test_transitions_run_once_across_workers(sessions: sessionmaker, async_sessions: async_sessionmaker, make_game):
+    with sessions() as db:
+        running = make_game(db, players=0)
+        closed = make_game(db, players=0)
+        closed.started_at = datetime.now(utc) - DAY_LENGTH * 8
+        closed.closes_at = closed.started_at + DAY_LENGTH * 7
+        over = make_game(db, players=0)
+        over.started_at = datetime.now(utc) - MARKET_HOURS - DAY_LENGTH
+        over.closes_at = over.started_at + DAY_LENGTH * 7
+        db.commit()
+        running_id, closed_id, over_id = running.id, closed.id, over.id
+
+    days: List[Tuple[int, int]] = []
+    closes: List[int] = []
+    market_closes: List[int] = []
+
+    async def on_day(game_id: int, day: int):
+        days.append((game_id, day))
+
+    async def on_close(game_id: int):
+        closes.append(game_id)
+
+    async def on_market_close(game_id: int):
+        market_closes.append(game_id)
+
+    async def run():
+        schedulers = [MarketScheduler(async_sessions) for _ in range(WORKERS)]
+        for scheduler in schedulers:
+            scheduler.on_day(on_day)
+            scheduler.on_close(on_close)
+            scheduler.on_market_close(on_market_close)
+        await asyncio.gather(*(s.load() for s in schedulers))
+        await asyncio.gather(*(s.run_due() for s in schedulers))
+        return schedulers
+
+    schedulers = asyncio.run(run())
+
+    # Started two days ago, the rest of its days are still ahead. Trading goes on after the close.
+    expected_days = [(running_id, 1), (running_id, 2)] + [(id, d) for id in (closed_id, over_id) for d in range(1, 8)]
+    assert Counter(days) == Counter(expected_days)
+    assert sorted(closes) == [closed_id, over_id]
+    assert market_closes == [over_id]
+    assert sum(s.fired for s in schedulers) == 17
+    # Days 3 to 7 and the market close of the running game, the market close of the closed one
+    assert all(s.stats()["scheduled"] == 7 for s in schedulers)
+    with sessions() as db:
+        assert [db.get(Game, id).ticked_day for id in (running_id, closed_id, over_id)] == [2, 7, 8]
+
+    # Scanned again, as on a restart
+    assert asyncio.run(run())[0].stats()["scheduled"] == 7
+    assert sorted(closes) == [closed_id, over_id]
+    assert market_closes == [over_id]
+
+
+def test_failed_close_runs_again(sessions: sessionmaker, async_sessions: async_sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=0)
+        game.started_at = datetime.now(utc) - DAY_LENGTH * 8
+        game.closes_at = game.started_at + DAY_LENGTH * 7
+        game.ticked_day = 6
+        db.commit()
+        game_id = game.id
+
+    attempts: List[int] = []
+
+    async def on_close(game_id: int):
+        attempts.append(game_id)
+        if len(attempts) == 1:
+            raise ConnectionError("Database went away")
+
+    async def run():
+        scheduler = MarketScheduler(async_sessions)
+        scheduler.on_close(on_close)
+        for _ in range(3):
+            await scheduler.load()
+            await scheduler.run_due()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+
+    assert attempts == [game_id, game_id]
+    assert (scheduler.failed, scheduler.fired) == (1, 1)
+    with sessions() as db:
+        assert db.get(Game, game_id).ticked_day == 7
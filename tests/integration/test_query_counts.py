@@ -0,0 +1,64 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.middleware import Middleware
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import api.game.game
+from app.services.game_cache import GameCache
+from core.entities.schema.db import get_async_db, get_db
+from core.entities.schema.game import save_game_results
+from core.utils.query_counter import HEADER, QueryCountMiddleware, count_queries
+
+
+@pytest.fixture
+def client(monkeypatch, engine, sessions: sessionmaker, async_sessions: async_sessionmaker) -> TestClient:
+    # A cache of its own, as game ids repeat across test databases. Trades run in the request transaction.
+    monkeypatch.setattr(api.game.game, "game_cache", GameCache(16))
+    monkeypatch.setattr(api.game.game, "trade_batcher", None)
+    count_queries(engine)
+    count_queries(async_sessions.kw["bind"].sync_engine)
+
+    def override_db():
+        with sessions() as db:
+            yield db
+
+    async def override_async_db():
+        async with async_sessions() as db:
+            yield db
+
+    app = FastAPI(middleware=[Middleware(QueryCountMiddleware)])
+    app.include_router(api.game.game.game_router)
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_async_db] = override_async_db
+    return TestClient(app)
+
+
+def queries(response) -> int:
+    assert response.status_code < 400, response.text
+    return int(response.headers[HEADER])
+
+
+def test_queries_per_endpoint(client: TestClient, sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=1)
+        game_id, user_id, company_id = game.id, game.users[0].id, game.companies[0].id
+
+    assert queries(client.get("/game/summary", params={"language": "en"})) == 1
+
+    # The version, then the game profile of LOAD_PROFILES, unless the body is cached
+    response = client.get(f"/game/{game_id}")
+    assert queries(response) == 1 + 6
+    assert queries(client.get(f"/game/{game_id}")) == 1
+    assert queries(client.get(f"/game/{game_id}", headers={"If-None-Match": response.headers["etag"]})) == 1
+
+    client.cookies.set("user_id", str(user_id))
+    trade = {"trades": [{"company_id": company_id, "amount": 1}]}
+    assert queries(client.post(f"/game/{game_id}/trade", json=trade)) == 9
+
+    # Running games are ranked live, closed ones from their stored results
+    assert queries(client.get(f"/game/{game_id}/ranking")) == 1 + 6
+    with sessions() as db:
+        save_game_results(db, game_id, {user_id: 0})
+    assert queries(client.get(f"/game/{game_id}/ranking")) == 2
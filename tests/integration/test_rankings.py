@@ -0,0 +1,48 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.services.leaderboard import Leaderboard
+from core.entities.schema.game import User, get_rank_async, get_users_around_async
+
+
+def test_board_follows_commits(sessions: sessionmaker):
+    board = Leaderboard(size=10, ttl=60)
+    board.watch(sessions)
+    board.load([])
+
+    with sessions() as db:
+        db.add_all([User(nickname=n, password="", gold=g) for n, g in (("a", 100), ("b", 200))])
+        db.commit()
+        a = db.query(User).where(User.nickname == "a").one()
+        assert [e[1] for e in board.page(0, 2) or []] == ["b", "a"]
+
+        a.gold = 300
+        db.flush()
+        db.rollback()
+        assert [e[1] for e in board.page(0, 2) or []] == ["b", "a"]
+
+        a.gold = 300
+        db.commit()
+        assert [e[1] for e in board.page(0, 2) or []] == ["a", "b"]
+
+
+def test_rank_and_neighbours(sessions: sessionmaker, async_sessions: async_sessionmaker):
+    with sessions() as db:
+        db.add_all([User(nickname=f"user-{i}", password="", gold=100 * (i % 5)) for i in range(20)])
+        db.commit()
+        # Ties on gold are broken by id
+        expected = [u.nickname for u in db.query(User).order_by(User.gold.desc(), User.id)]
+
+    async def run():
+        async with async_sessions() as db:
+            me = await db.get(User, 8)
+            assert me is not None
+            rank = await get_rank_async(db, me)
+            around = await get_users_around_async(db, me, 2)
+            return me.nickname, rank, [u.nickname for u in around]
+
+    nickname, rank, around = asyncio.run(run())
+    assert expected[rank - 1] == nickname
+    assert around == expected[rank - 3 : rank + 2]
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from api.game.game import execute_trades
+from core.entities.dto.game import CreateTradeDTO, TradeReqDTO
+from core.entities.schema.game import Position, Trade, User, settle_game
+from core.utils.clock import DAY_LENGTH, MarketClock
+
+THREADS = 8
+
+
+def test_positions_are_sold_once_at_final_prices(sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=3)
+        holder, seller, idle = game.users
+        first, second = game.companies[:2]
+        first.price_path = [100, 110, 120, 130, 140, 150, 160, 170]
+        trades = [(holder, first, 10), (holder, second, 5), (seller, first, 3), (seller, first, -3)]
+        for user, company, amount in trades:
+            db.add(Trade(user_id=user.id, game_id=game.id, company_id=company.id, day=1, amount=amount))
+        db.add_all(
+            [
+                Position(game_id=game.id, user_id=holder.id, company_id=first.id, amount=10),
+                Position(game_id=game.id, user_id=holder.id, company_id=second.id, amount=5),
+                Position(game_id=game.id, user_id=seller.id, company_id=first.id, amount=0),
+            ]
+        )
+        db.commit()
+        game_id, user_ids, versions = game.id, [holder.id, seller.id, idle.id], [u.version for u in game.users]
+
+    def settle(_) -> bool:
+        with sessions() as db:
+            return settle_game(db, game_id)
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        settled = list(pool.map(settle, range(THREADS)))
+
+    assert settled.count(True) == 1
+    with sessions() as db:
+        users = [db.get(User, id) for id in user_ids]
+        assert [u.gold for u in users] == [10_000 + 10 * 170 + 5 * 100, 10_000, 10_000]
+        assert [u.version for u in users] == [v + 1 for v in versions]
+        assert all(p.amount == 0 for p in db.scalars(select(Position).where(Position.game_id == game_id)))
+        sells = db.scalars(select(Trade).where((Trade.game_id == game_id) & (Trade.day == 7))).all()
+        assert sorted((t.user_id, t.amount) for t in sells) == [(user_ids[0], -10), (user_ids[0], -5)]
+
+        with pytest.raises(HTTPException, match="Market closed"):
+            req = CreateTradeDTO(trades=[TradeReqDTO(company_id=first.id, amount=1)])
+            execute_trades(db, game_id, user_ids[2], req, MarketClock())
+
+
+def test_trades_on_the_last_day_until_settlement(sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=1)
+        # The last event happened, the market is still open
+        shift = DAY_LENGTH * 5 + timedelta(seconds=30)
+        game.started_at -= shift
+        game.closes_at -= shift
+        for company in game.companies:
+            for e in company.events:
+                e.happen_at -= shift
+        db.commit()
+        game_id, user_id, company_id = game.id, game.users[0].id, game.companies[0].id
+
+    req = CreateTradeDTO(trades=[TradeReqDTO(company_id=company_id, amount=1)])
+    with sessions() as db:
+        _, trades = execute_trades(db, game_id, user_id, req, MarketClock())
+        db.commit()
+        assert [t.day for t in trades] == [7]
+
+    with sessions() as db:
+        assert settle_game(db, game_id)
+    with sessions() as db, pytest.raises(HTTPException, match="Market closed"):
+        execute_trades(db, game_id, user_id, req, MarketClock())
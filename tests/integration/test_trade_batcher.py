@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import List, Union
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.services.game_service import GameService
+from app.services.trade_batcher import BatchAbortedException, TradeBatcher, TradeRejectedException
+from core.entities.dto.game import TradeReqDTO
+from core.entities.schema.game import Position, User
+from core.utils.clock import MarketClock
+
+THREADS = 16
+
+
+@pytest.fixture
+def batcher(sessions: sessionmaker) -> TradeBatcher:
+    return TradeBatcher(GameService(), sessions, window=0.02)
+
+
+def submit(batcher: TradeBatcher, game_id: int, user_id: int, company_id: int, amount: int) -> int:
+    try:
+        batcher.submit(game_id, user_id, [TradeReqDTO(company_id=company_id, amount=amount)], MarketClock())
+    except TradeRejectedException as e:
+        return e.status
+    return 200
+
+
+def test_trades_of_a_burst_are_committed_together(batcher: TradeBatcher, sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=THREADS)
+        game_id, company_id = game.id, game.companies[0].id
+        user_ids = [u.id for u in game.users]
+
+    def trade_repeatedly(user_id: int) -> List[int]:
+        return [submit(batcher, game_id, user_id, company_id, 1) for _ in range(5)]
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        statuses = [s for user_statuses in pool.map(trade_repeatedly, user_ids) for s in user_statuses]
+
+    assert statuses == [200] * THREADS * 5
+    assert batcher.trades == THREADS * 5
+    assert batcher.commits < batcher.trades
+    with sessions() as db:
+        for user_id in user_ids:
+            position = db.get(Position, (game_id, user_id, company_id))
+            user = db.get(User, user_id)
+            assert position is not None and position.amount == 5
+            assert user is not None and user.gold == 10_000 - 5 * 100
+
+
+def test_batched_trades_never_overspend(batcher: TradeBatcher, sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=1)
+        game_id, user_id, company_id = game.id, game.users[0].id, game.companies[0].id
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        statuses = list(pool.map(lambda _: submit(batcher, game_id, user_id, company_id, 60), range(THREADS)))
+
+    assert statuses.count(200) == 1
+    assert statuses.count(400) == THREADS - 1
+    with sessions() as db:
+        user = db.get(User, user_id)
+        assert user is not None and user.gold == 10_000 - 60 * 100
+
+
+def test_stale_state_aborts_the_batch(batcher: TradeBatcher, sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=1)
+        game_id, user_id, company_id = game.id, game.users[0].id, game.companies[0].id
+    assert submit(batcher, game_id, user_id, company_id, 10) == 200
+
+    # A trade committed outside of the batcher, as by another worker
+    with sessions() as db:
+        user = db.get(User, user_id)
+        assert user is not None
+        user.gold -= 8_000
+        db.commit()
+
+    with pytest.raises(BatchAbortedException):
+        submit(batcher, game_id, user_id, company_id, 10)
+    assert batcher.aborts == 1
+    # State is read again, with the gold left
+    assert submit(batcher, game_id, user_id, company_id, 10) == 200
+    assert submit(batcher, game_id, user_id, company_id, 10) == 400
+
+
+def test_rejected_trades(batcher: TradeBatcher, sessions: sessionmaker, make_game):
+    with sessions() as db:
+        game = make_game(db, players=1)
+        outsider = User(nickname="outsider", password="", gold=10_000)
+        db.add(outsider)
+        db.commit()
+        game_id, user_id, company_id = game.id, game.users[0].id, game.companies[0].id
+        started_at = game.started_at
+
+    assert submit(batcher, game_id, outsider.id, company_id, 1) == 403
+    assert submit(batcher, game_id + 1, user_id, company_id, 1) == 404
+    with pytest.raises(TradeRejectedException, match="Market closed"):
+        clock = MarketClock(started_at + timedelta(minutes=17))
+        batcher.submit(game_id, user_id, [TradeReqDTO(company_id=company_id, amount=1)], clock)
+
+
+def test_failed_commit_is_not_acknowledged(sessions: sessionmaker, make_game):
+    failures = [RuntimeError("Listener failed")]
+
+    def session_factory() -> Session:
+        db = sessions()
+
+        @event.listens_for(db, "after_commit")
+        def fail_once(session: Session):
+            if failures:
+                raise failures.pop()
+
+        return db
+
+    # A long window, the batch is flushed once both trades are queued
+    batcher = TradeBatcher(GameService(), session_factory, window=5, max_size=2)
+    with sessions() as db:
+        game = make_game(db, players=2)
+        game_id, company_id = game.id, game.companies[0].id
+        user_ids = [u.id for u in game.users]
+
+    def trade(user_id: int) -> Union[int, str]:
+        try:
+            return submit(batcher, game_id, user_id, company_id, 1)
+        except RuntimeError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(2) as pool:
+        outcomes = list(pool.map(trade, user_ids))
+
+    assert sorted(outcomes, key=str) == [500, "Listener failed"]
+    assert batcher.aborts == 1
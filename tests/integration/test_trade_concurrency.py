@@ -0,0 +1,72 @@
+"""Concurrent trade submissions, on TEST_DATABASE_URL (e.g. a Postgres container) or a temporary SQLite file"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from api.game.game import execute_trades, retry_on_conflict
+from core.entities.dto.game import CreateTradeDTO, TradeReqDTO
+from core.entities.schema.game import Game, Position, User
+from core.utils.clock import MarketClock
+
+THREADS = 16
+
+
+def submit(sessions: sessionmaker, game_id: int, user_id: int, trades: List[TradeReqDTO]) -> int:
+    with sessions() as db:
+        req = CreateTradeDTO(trades=trades)
+        try:
+            retry_on_conflict(db, lambda: execute_trades(db, game_id, user_id, req, MarketClock()))
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+
+@pytest.mark.parametrize("amount", [60, -6], ids=["buy", "sell"])
+def test_parallel_trades_of_one_user_never_overspend(sessions: sessionmaker, make_game, amount: int):
+    with sessions() as db:
+        game = make_game(db, players=1)
+        game_id, user_id, company_id = game.id, game.users[0].id, game.companies[0].id
+    # 60% of the gold, or 60% of the holdings
+    assert submit(sessions, game_id, user_id, [TradeReqDTO(company_id=company_id, amount=10)]) == 200
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        trade = [TradeReqDTO(company_id=company_id, amount=amount)]
+        statuses = list(pool.map(lambda _: submit(sessions, game_id, user_id, trade), range(THREADS)))
+
+    assert statuses.count(200) == 1
+    assert statuses.count(400) == THREADS - 1
+    with sessions() as db:
+        user = db.get(User, user_id)
+        position = db.get(Position, (game_id, user_id, company_id))
+        assert user is not None and position is not None
+        assert position.amount == 10 + amount
+        assert user.gold == 10_000 - 100 * position.amount
+        assert user.gold >= 0 and position.amount >= 0
+
+
+def test_parallel_trades_of_many_users_do_not_conflict(sessions: sessionmaker, make_game):
+    players, trades_per_player = THREADS, 10
+    with sessions() as db:
+        game = make_game(db, players=players)
+        game_id, version, company_id = game.id, game.version, game.companies[0].id
+        user_ids = [u.id for u in game.users]
+
+    def trade_repeatedly(user_id: int) -> List[int]:
+        trade = [TradeReqDTO(company_id=company_id, amount=1)]
+        return [submit(sessions, game_id, user_id, trade) for _ in range(trades_per_player)]
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        statuses = [s for user_statuses in pool.map(trade_repeatedly, user_ids) for s in user_statuses]
+
+    assert statuses == [200] * players * trades_per_player
+    with sessions() as db:
+        # Trades never write to the game row, so they do not queue on its lock
+        game = db.get(Game, game_id)
+        assert game is not None and game.version == version
+        for user_id in user_ids:
+            position = db.get(Position, (game_id, user_id, company_id))
+            assert position is not None and position.amount == trades_per_player
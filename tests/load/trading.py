@@ -0,0 +1,241 @@
+"""Load generator for multiplayer trading against a running server.
+
+Signs in N users, joins them to a game, starts it and replays trading and
+polling over the seven-day window: every trader polls GET /game/{id} with its
+ETag, reacts to each new day with a burst of trades and trades now and then in
+between. Reports throughput, tail latency, error rates and, when the server has
+db_query_header enabled, DB queries per request.
+
+    python tests/load/trading.py --url http://127.0.0.1:3000/api --users 50
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+DAYS = 7
+QUERY_HEADER = "X-DB-Queries"
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.queries: Dict[str, List[int]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.started = time.monotonic()
+
+    def record(self, name: str, status: int, seconds: float, queries: Optional[str]):
+        self.latencies[name].append(seconds)
+        self.statuses[name][status] += 1
+        if queries is not None and queries.isdigit():
+            self.queries[name].append(int(queries))
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        elapsed = time.monotonic() - self.started
+        result = {}
+        for name, latencies in self.latencies.items():
+            count = len(latencies)
+            errors = sum(n for status, n in self.statuses[name].items() if status >= 400)
+            queries = self.queries[name]
+            result[name] = {
+                "count": count,
+                "rps": count / elapsed,
+                "error_rate": errors / count,
+                "statuses": dict(self.statuses[name]),
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "queries_avg": sum(queries) / len(queries) if queries else None,
+                "queries_max": max(queries) if queries else None,
+            }
+        return result
+
+
+class Trader:
+    def __init__(self, session: aiohttp.ClientSession, base_url: str, stats: Stats, nickname: str, password: str):
+        self.session = session
+        self.base_url = base_url
+        self.stats = stats
+        self.nickname = nickname
+        self.password = password
+
+        self.user_id: Optional[int] = None
+        self.gold = 0
+        self.holdings: Dict[int, int] = defaultdict(int)
+        self.prices: Dict[int, int] = {}
+        self.day = -1
+        self.etag: Optional[str] = None
+
+    async def request(self, name: str, method: str, path: str, **kwargs) -> aiohttp.ClientResponse:
+        headers = kwargs.pop("headers", {})
+        if self.user_id is not None:
+            # The cookie is set secure, so it is passed by hand over plain HTTP
+            headers["Cookie"] = f"user_id={self.user_id}"
+        started = time.perf_counter()
+        async with self.session.request(method, self.base_url + path, headers=headers, **kwargs) as resp:
+            await resp.read()
+        self.stats.record(name, resp.status, time.perf_counter() - started, resp.headers.get(QUERY_HEADER))
+        return resp
+
+    async def signin(self):
+        body = {"nickname": self.nickname, "password": self.password}
+        resp = await self.request("signin", "POST", "/user/signin", json=body)
+        if not resp.ok:
+            raise RuntimeError(f"Sign in failed for {self.nickname}: {resp.status}")
+        body = await resp.json()
+        self.user_id = body["id"]
+        self.gold = body["gold"]
+
+    async def create_game(self, theme: str, language: str) -> Dict[str, Any]:
+        resp = await self.request("create", "POST", "/game/", json={"theme": theme, "language": language})
+        if not resp.ok:
+            raise RuntimeError(f"Game creation failed: {resp.status} {await resp.text()}")
+        return await resp.json()
+
+    async def join(self, game_id: int) -> Dict[str, Any]:
+        resp = await self.request("join", "PUT", f"/game/{game_id}/join")
+        if not resp.ok:
+            raise RuntimeError(f"Join failed for {self.nickname}: {resp.status} {await resp.text()}")
+        return await resp.json()
+
+    async def start(self, game_id: int):
+        resp = await self.request("start", "PUT", f"/game/{game_id}/start")
+        if not resp.ok:
+            raise RuntimeError(f"Start failed: {resp.status} {await resp.text()}")
+
+    async def poll(self, game_id: int) -> Optional[Dict[str, Any]]:
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        resp = await self.request("poll", "GET", f"/game/{game_id}", headers=headers)
+        if resp.status != 200:
+            return None
+        self.etag = resp.headers.get("ETag")
+        return await resp.json()
+
+    async def trade(self, game_id: int):
+        if not self.prices:
+            return
+        company_id = random.choice(list(self.prices))
+        price = self.prices[company_id]
+        if self.holdings[company_id] > 0 and random.random() < 0.4:
+            amount = -random.randint(1, self.holdings[company_id])
+        else:
+            affordable = int(self.gold * random.uniform(0.05, 0.3)) // max(price, 1)
+            if affordable <= 0:
+                return
+            amount = random.randint(1, affordable)
+
+        resp = await self.request(
+            "trade",
+            "POST",
+            f"/game/{game_id}/trade",
+            json={"trades": [{"company_id": company_id, "amount": amount}]},
+        )
+        if resp.ok:
+            body = await resp.json()
+            self.gold = body["gold"]
+            self.holdings = defaultdict(int, {int(k): v for k, v in body["holdings"].items()})
+
+    async def run(self, game_id: int, deadline: float, poll_interval: float, trade_rate: float, day_length: float):
+        # Chance per poll of trading between days, for trade_rate trades per day
+        background = trade_rate * poll_interval / day_length
+        while time.monotonic() < deadline:
+            game = await self.poll(game_id)
+            if game is not None:
+                if game["closed"]:
+                    return
+                self.prices = {c["id"]: c["history"][-1] for c in game["companies"] if c["history"]}
+                day = len(game["companies"][0]["events"]) if game["companies"] else 0
+                if day != self.day:
+                    self.day = day
+                    # Most traders react to the news of the day right away
+                    for _ in range(random.randint(0, 3)):
+                        await self.trade(game_id)
+            if random.random() < background:
+                await self.trade(game_id)
+            await asyncio.sleep(poll_interval * random.uniform(0.5, 1.5))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    stats = Stats()
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        traders = [
+            Trader(session, args.url.rstrip("/"), stats, f"{args.prefix}-{i}", args.password) for i in range(args.users)
+        ]
+        await asyncio.gather(*[t.signin() for t in traders])
+
+        if args.game_id is None:
+            game = await traders[0].create_game(args.theme, args.language)
+        else:
+            game = await traders[0].join(args.game_id)
+        game_id = game["id"]
+        for t in traders[1:]:
+            game = await t.join(game_id)
+
+        owner = next((t for t in traders if t.user_id == game["owner_id"]), None)
+        if owner is None:
+            raise RuntimeError(f"Game {game_id} is owned by a user outside the load test")
+        await owner.start(game_id)
+
+        print(f"Trading in game {game_id} with {len(traders)} users")
+        deadline = time.monotonic() + (args.duration or DAYS * args.day_length)
+        stats.started = time.monotonic()
+        await asyncio.gather(
+            *[t.run(game_id, deadline, args.poll_interval, args.trade_rate, args.day_length) for t in traders]
+        )
+    return stats.summary()
+
+
+def report(summary: Dict[str, Dict[str, Any]]):
+    print(
+        f"{'request':<8} {'count':>7} {'rps':>8} {'errors':>7} "
+        f"{'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'max':>5}"
+    )
+    for name, s in summary.items():
+        queries = f"{'-':>8} {'-':>5}"
+        if s["queries_avg"] is not None:
+            queries = f"{s['queries_avg']:>8.1f} {s['queries_max']:>5}"
+        print(
+            f"{name:<8} {s['count']:>7} {s['rps']:>8.1f} {s['error_rate']:>7.1%} "
+            f"{s['p50'] * 1000:>6.1f}ms {s['p95'] * 1000:>6.1f}ms {s['p99'] * 1000:>6.1f}ms {queries}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay multiplayer trading against a running server")
+    parser.add_argument("--url", default="http://127.0.0.1:3000/api", help="API base URL, including the prefix")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--game-id", type=int, help="Unstarted game to join, instead of creating one")
+    parser.add_argument("--theme", default="Load test")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--prefix", default="load", help="Nickname prefix of the signed in users")
+    parser.add_argument("--password", default="load-test")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls of each trader")
+    parser.add_argument("--trade-rate", type=float, default=2.0, help="Trades per trader per day, between days")
+    parser.add_argument("--day-length", type=float, default=60.0, help="Seconds per game day on the server")
+    parser.add_argument("--duration", type=float, help="Seconds to trade for, the whole week by default")
+    parser.add_argument("--connections", type=int, default=100, help="Client connection pool size")
+    parser.add_argument("--output", help="Write the summary as JSON, to compare runs")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    report(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pytz import utc
+
+from core.entities.schema.game import Company, Event, Game
+from core.utils.clock import MARKET_HOURS, MarketClock
+
+
+@pytest.fixture
+def company() -> Company:
+    game = Game(language="en")
+    company = Company(name="Company", description="Description", price=100, thumbnail="")
+    game.companies.append(company)
+    for d in range(7):
+        company.events.append(Event(day=d + 1, description="", price=10, happen_at=datetime.now(utc)))
+    return company
+
+
+def test_price_path(company: Company):
+    assert company.compute_price_path() == [100, 110, 121, 133, 146, 160, 176, 193]
+
+
+def test_prices_follow_visible_events(company: Company):
+    company.compute_price_path()
+    assert company.prices == [100]
+
+    company.game.started_at = datetime.now(utc) - timedelta(minutes=3, seconds=30)
+    for i, e in enumerate(company.events):
+        e.happen_at = company.game.started_at + timedelta(minutes=i + 1)
+    assert company.prices == [100, 110, 121, 133]
+
+
+def test_price_path_invalidated_on_event_change(company: Company):
+    company.compute_price_path()
+    company.events[0].price = -50
+    assert company.price_path is None
+    assert company.compute_price_path()[:3] == [100, 50, 55]
+
+
+def test_market_clock_snapshot(company: Company):
+    company.compute_price_path()
+    company.game.started_at = datetime.now(utc)
+    for i, e in enumerate(company.events):
+        e.happen_at = company.game.started_at + timedelta(minutes=i + 1)
+
+    clock = MarketClock(company.game.started_at + timedelta(minutes=2, seconds=1))
+    assert clock.visible_count(company) == 2
+    assert company.visible_prices(clock) == [100, 110, 121]
+    assert [clock.ms_left(e) for e in company.events[1:3]] == [0, 59_000]
+
+    # Visibility is memoized for the lifetime of the snapshot
+    company.events[2].happen_at = clock.now - timedelta(seconds=1)
+    assert len(company.visible_events(clock)) == 2
+
+
+def test_market_open_until_market_hours_or_settlement():
+    game = Game(language="en")
+    assert not game.is_market_open()
+
+    game.started_at = datetime.now(utc)
+    assert game.is_market_open(MarketClock(game.started_at + MARKET_HOURS))
+    assert not game.is_market_open(MarketClock(game.started_at + MARKET_HOURS + timedelta(seconds=1)))
+
+    game.settled_at = game.started_at
+    assert not game.is_market_open(MarketClock(game.started_at))
@@ -1,6 +1,11 @@
+import asyncio
+import time
+from typing import Dict, List, Tuple
+
 import pytest
 
-from app.services.game_service import GameService
+from app.services.game_service import GameService, CompanyFormat
+from core.entities.schema.game import Company, Event
 
 
 @pytest.fixture(scope="module")
@@ -10,3 +15,56 @@ def service() -> GameService:
 
 def test_exists(service: GameService):
     assert len(service.gpt_model) > 0
+
+
+class PipelineService(GameService):
+    def __init__(self, fail_thumbnails: bool = False):
+        super().__init__()
+        self.fail_thumbnails = fail_thumbnails
+        self.events_cancelled = False
+        # (start, end) of each stubbed chain
+        self.spans: Dict[str, Tuple[float, float]] = {}
+
+    async def generate_companies(self, theme: str, language: str):
+        forms = [CompanyFormat(name="C", description="D", price=100, name_en="C", description_en="D")] * 5
+        companies = [Company(name=f.name, description=f.description, price=f.price) for f in forms]
+        return companies, forms, theme
+
+    async def get_companies_thumbnail(self, companies: List[CompanyFormat]) -> List[str]:
+        start = time.monotonic()
+        await asyncio.sleep(0.05)
+        if self.fail_thumbnails:
+            raise RuntimeError("getimg is down")
+        self.spans["thumbnails"] = (start, time.monotonic())
+        return [f"{i}.jpg" for i in range(len(companies))]
+
+    async def create_new_events(self, companies: List[Company], language: str) -> List[Event]:
+        start = time.monotonic()
+        try:
+            await asyncio.sleep(0.5 if self.fail_thumbnails else 0.05)
+        except asyncio.CancelledError:
+            self.events_cancelled = True
+            raise
+        self.spans["events"] = (start, time.monotonic())
+        return []
+
+
+def test_game_content_runs_thumbnails_and_events_concurrently():
+    service = PipelineService()
+    timings = {}
+    companies, title = asyncio.run(service.create_game_content("Theme", "en", timings))
+
+    assert title == "Theme"
+    assert [c.thumbnail for c in companies] == ["0.jpg", "1.jpg", "2.jpg", "3.jpg", "4.jpg"]
+    assert set(timings) == {"companies", "thumbnails", "events"}
+    # Each chain starts before the other one ends
+    thumbnails_start, thumbnails_end = service.spans["thumbnails"]
+    events_start, events_end = service.spans["events"]
+    assert thumbnails_start < events_end and events_start < thumbnails_end
+
+
+def test_game_content_failure_cancels_other_chain():
+    service = PipelineService(fail_thumbnails=True)
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.create_game_content("Theme", "en"))
+    assert service.events_cancelled
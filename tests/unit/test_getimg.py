@@ -0,0 +1,76 @@
+import asyncio
+from typing import List
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from core.utils.getimg import GetImgClient, GetImgException
+
+
+async def with_server(statuses: List[int], run, **client_args):
+    """Serves the given statuses in order from a local getimg stand-in, asking for an hour before a retry"""
+    requests = []
+
+    async def handler(request: web.Request) -> web.Response:
+        requests.append(await request.json())
+        status = statuses[min(len(requests), len(statuses)) - 1]
+        if status != 200:
+            return web.Response(status=status, headers={"Retry-After": "3600"})
+        return web.json_response({"cost": 0.1, "seed": 1, "image": "aW1n"})
+
+    app = web.Application()
+    app.router.add_post("/", handler)
+    async with TestServer(app) as server:
+        client = GetImgClient(**{"url": str(server.make_url("/")), "backoff": 0.01, "max_backoff": 0.05, **client_args})
+        try:
+            return await run(client), requests
+        finally:
+            await client.close()
+
+
+def test_generate_image_retries_on_rate_limit():
+    resp, requests = asyncio.run(with_server([429, 503, 200], lambda c: c.generate_image("prompt")))
+    assert resp.image == "aW1n"
+    assert len(requests) == 3
+
+
+def test_generate_image_gives_up():
+    async def run(client: GetImgClient):
+        with pytest.raises(GetImgException):
+            await client.generate_image("prompt")
+
+    _, requests = asyncio.run(with_server([400], run))
+    assert len(requests) == 1
+
+
+def test_generate_image_shares_session(monkeypatch):
+    created: List[aiohttp.ClientSession] = []
+    session_class = aiohttp.ClientSession
+
+    def counted_session(*args, **kwargs) -> aiohttp.ClientSession:
+        created.append(session_class(*args, **kwargs))
+        return created[-1]
+
+    monkeypatch.setattr(aiohttp, "ClientSession", counted_session)
+
+    async def run(client: GetImgClient):
+        await client.generate_image("prompt")
+        first = client._session
+        await asyncio.gather(*[client.generate_image("prompt") for _ in range(5)])
+        return first, client._session
+
+    (first, last), requests = asyncio.run(with_server([200], run))
+    assert first is not None and last is first
+    assert created == [first]
+    assert len(requests) == 6
+
+
+def test_backoff_releases_its_slot():
+    async def run(client: GetImgClient):
+        # The first request backs off after its 429, while the second takes the only slot
+        return await asyncio.gather(client.generate_image("first"), client.generate_image("second"))
+
+    _, requests = asyncio.run(with_server([429, 200], run, max_concurrency=1, max_backoff=0.5))
+    assert [r["prompt"] for r in requests] == ["first", "second", "first"]
@@ -0,0 +1,55 @@
+from app.services.leaderboard import Leaderboard
+
+
+def make_board(size: int = 3) -> Leaderboard:
+    board = Leaderboard(size=size, ttl=60)
+    # The top 3 of a larger table
+    board.load([(1, "a", 500), (2, "b", 400), (3, "c", 300)])
+    return board
+
+
+def test_page_from_loaded_board():
+    board = make_board()
+    assert board.page(0, 2) == [(1, "a", 500), (2, "b", 400)]
+    # Deeper than what was loaded
+    assert board.page(2, 2) is None
+
+
+def test_unloaded_or_expired_board():
+    board = Leaderboard(size=3, ttl=60)
+    assert board.page(0, 1) is None
+
+    board = make_board()
+    board.invalidate()
+    assert board.page(0, 1) is None
+
+
+def test_updates_reorder_the_board():
+    board = make_board()
+    board.update(3, "c", 600)
+    board.update(4, "d", 350)
+    assert board.page(0, 4) == [(3, "c", 600), (1, "a", 500), (2, "b", 400), (4, "d", 350)]
+
+
+def test_users_below_the_floor_are_dropped():
+    board = make_board()
+    # Someone unseen may now rank third
+    board.update(2, "b", 100)
+    board.update(5, "e", 200)
+    assert board.page(0, 2) == [(1, "a", 500), (3, "c", 300)]
+    assert board.page(0, 3) is None
+
+
+def test_small_table_is_complete():
+    board = Leaderboard(size=10, ttl=60)
+    board.load([(1, "a", 500)])
+    board.update(2, "b", 10)
+    assert board.page(0, 10) == [(1, "a", 500), (2, "b", 10)]
+
+
+def test_board_is_trimmed():
+    board = make_board()
+    for i in range(10, 20):
+        board.update(i, str(i), 1000 + i)
+    assert board.page(0, 3) == [(19, "19", 1019), (18, "18", 1018), (17, "17", 1017)]
+    assert board.page(0, 10) is None
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import time
+
+from core.utils.llm_cache import LLMCache
+
+
+def test_key_normalizes_whitespace():
+    a = LLMCache.make_key("gpt", "en", [{"role": "user", "content": "Theme:  space\n"}])
+    b = LLMCache.make_key("gpt", "EN", [{"role": "user", "content": "Theme: space"}])
+    c = LLMCache.make_key("gpt", "ko", [{"role": "user", "content": "Theme: space"}])
+    assert a == b
+    assert a != c
+
+
+def test_hit_and_miss(tmp_path):
+    cache = LLMCache(str(tmp_path), ttl=60, max_entries=10)
+    assert asyncio.run(cache.get("k")) is None
+    asyncio.run(cache.put("k", "{}"))
+    assert asyncio.run(cache.get("k")) == "{}"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_ttl(tmp_path):
+    cache = LLMCache(str(tmp_path), ttl=-1, max_entries=10)
+    asyncio.run(cache.put("k", "{}"))
+    assert asyncio.run(cache.get("k")) is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = LLMCache(str(tmp_path), ttl=60, max_entries=2)
+    for key in ("a", "b"):
+        asyncio.run(cache.put(key, "{}"))
+    past = time.time() - 10
+    os.utime(tmp_path / "b.json", (past, past))
+    asyncio.run(cache.put("c", "{}"))
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+    assert cache.evictions == 1
+
+
+def test_reuse_rate(tmp_path):
+    cache = LLMCache(str(tmp_path), ttl=60, max_entries=10, reuse_rate=0)
+    asyncio.run(cache.put("k", "{}"))
+    assert asyncio.run(cache.get("k")) is None
+    assert cache.skipped == 1
+
+
+def test_concurrent_puts_and_expiring_gets(tmp_path):
+    cache = LLMCache(str(tmp_path), ttl=-1, max_entries=2)
+
+    async def run():
+        puts = [cache.put(f"k{i % 4}", "{}") for i in range(32)]
+        gets = [cache.get(f"k{i % 4}") for i in range(32)]
+        return await asyncio.gather(*puts, *gets)
+
+    # Entries expire at once, racing gets remove them while others read or evict them
+    assert asyncio.run(run())[32:] == [None] * 32
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
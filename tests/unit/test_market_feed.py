@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List
+
+from pytz import utc
+
+from app.services.market_feed import MarketFeed
+from core.entities.schema.game import Company, Event, Game, Trade
+
+
+def make_game() -> Game:
+    now = datetime.now(utc)
+    game = Game(id=1, language="en", started_at=now)
+    for i in range(2):
+        company = Company(id=i + 1, name="Company", description="", price=100, thumbnail="")
+        game.companies.append(company)
+        for d in range(7):
+            happen_at = now + timedelta(milliseconds=20 * (d + 1))
+            company.events.append(Event(id=i * 7 + d, day=d + 1, description="", price=10, happen_at=happen_at))
+    return game
+
+
+def test_feed_broadcasts_same_bytes():
+    game = make_game()
+    feed = MarketFeed()
+
+    async def subscriber() -> List[bytes]:
+        messages = []
+        async with feed.subscribe(game) as queue:
+            while (data := await queue.get()) is not None:
+                messages.append(data)
+        return messages
+
+    async def run():
+        tasks = [asyncio.create_task(subscriber()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        feed.publish_trades(game.id, [Trade(company_id=1, user_id=1, amount=2, day=0)])
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(run())
+    assert results[0][0].startswith(b"event: trade")
+    assert sum(m.startswith(b"event: tick") for m in results[0]) == 7
+    assert results[0][-1].startswith(b"event: closed")
+    assert all(r[1] is results[0][1] for r in results)
+    assert feed._channels == {}
@@ -0,0 +1,43 @@
+from typing import Iterator, Optional
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from core.entities.schema.db import Base
+from core.entities.schema.game import Company, Game, Position, Trade, User, create_trades, get_game_by_id
+
+
+@pytest.fixture
+def db() -> Iterator[Session]:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine, expire_on_commit=False) as db:
+        yield db
+    engine.dispose()
+
+
+# Positions are updated in place on a loaded game, and read from the table otherwise
+@pytest.mark.parametrize("loaded", [True, False], ids=["loaded", "queried"])
+def test_positions_follow_trades(db: Session, loaded: bool):
+    user = User(nickname="trader", password="", gold=10_000)
+    companies = [Company(name=f"Company {c}", description="", price=100, thumbnail="") for c in range(2)]
+    db.add(Game(language="en", companies=companies, users=[user]))
+    db.commit()
+    game_id, first, second = user.games[0].id, companies[0].id, companies[1].id
+
+    def trade(company_id: int, amount: int):
+        game: Optional[Game] = get_game_by_id(db, game_id, profile="trade") if loaded else None
+        create_trades(db, [Trade(user_id=user.id, game_id=game_id, company_id=company_id, day=1, amount=amount)], game)
+        db.expire_all()
+        return {p.company_id: p.amount for p in db.query(Position).where(Position.user_id == user.id)}
+
+    assert trade(first, 10) == {first: 10}
+    assert trade(second, 5) == {first: 10, second: 5}
+    assert trade(first, -4) == {first: 6, second: 5}
+    # Sold out, the row stays at zero
+    assert trade(first, -6) == {first: 0, second: 5}
+
+    game = get_game_by_id(db, game_id)
+    assert game is not None
+    assert game.get_holdings(user) == {first: 0, second: 5}
@@ -0,0 +1,48 @@
+from fastapi import Depends, FastAPI
+from fastapi.middleware import Middleware
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.utils.query_counter import HEADER, QueryCountMiddleware, count_queries
+
+
+def make_app(tmp_path) -> FastAPI:
+    engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+    count_queries(engine)
+    count_queries(async_engine.sync_engine)
+
+    app = FastAPI(middleware=[Middleware(QueryCountMiddleware)])
+
+    def get_conn():
+        with engine.connect() as conn:
+            yield conn
+
+    @app.get("/sync")
+    def sync_route(conn=Depends(get_conn)):
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+        return "ok"
+
+    @app.get("/async")
+    async def async_route():
+        async with async_engine.connect() as conn:
+            for i in range(3):
+                await conn.execute(text(f"SELECT {i}"))
+        return "ok"
+
+    @app.get("/none")
+    async def no_queries():
+        return "ok"
+
+    return app
+
+
+def test_counts_queries_per_request(tmp_path):
+    client = TestClient(make_app(tmp_path))
+
+    assert client.get("/sync").headers[HEADER] == "2"
+    assert client.get("/async").headers[HEADER] == "3"
+    assert client.get("/none").headers[HEADER] == "0"
+    assert client.get("/sync").headers[HEADER] == "2"
@@ -0,0 +1,122 @@
+import asyncio
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app.server import ThumbnailFiles
+from core.utils.thumbnail import ThumbnailWriter, ThumbnailException, INDEX_DIR, collect_garbage, is_jpeg, list_variants
+from core.utils.thumbnail import variant_name
+
+
+def encode(fmt: str, color: str = "red") -> bytes:
+    out = BytesIO()
+    Image.new("RGB", (8, 8), color).save(out, fmt)
+    return out.getvalue()
+
+
+@pytest.fixture
+def writer(tmp_path) -> ThumbnailWriter:
+    return ThumbnailWriter(str(tmp_path))
+
+
+def test_jpeg_is_stored_as_is(writer: ThumbnailWriter):
+    data = encode("JPEG")
+    fname = asyncio.run(writer.write(base64.b64encode(data).decode()))
+    with open(os.path.join(writer.directory, fname), "rb") as f:
+        assert f.read() == data
+
+
+def test_other_formats_are_converted(writer: ThumbnailWriter):
+    fname = asyncio.run(writer.write(base64.b64encode(encode("PNG")).decode()))
+    with open(os.path.join(writer.directory, fname), "rb") as f:
+        assert is_jpeg(f.read())
+
+
+def test_invalid_image_is_rejected(writer: ThumbnailWriter):
+    with pytest.raises(ThumbnailException):
+        asyncio.run(writer.write(base64.b64encode(b"not an image").decode()))
+
+
+def test_identical_images_are_stored_once(writer: ThumbnailWriter):
+    b64 = base64.b64encode(encode("JPEG")).decode()
+    assert asyncio.run(writer.write(b64)) == asyncio.run(writer.write(b64))
+
+
+def test_prompt_lookup(writer: ThumbnailWriter):
+    assert asyncio.run(writer.lookup("Name: A")) is None
+    fname = asyncio.run(writer.write(base64.b64encode(encode("JPEG")).decode(), "Name: A"))
+    assert asyncio.run(writer.lookup("Name:  A")) == fname
+
+
+def test_collect_garbage(writer: ThumbnailWriter):
+    kept = asyncio.run(writer.write(base64.b64encode(encode("JPEG")).decode()))
+    orphan = asyncio.run(writer.write(base64.b64encode(encode("PNG", "blue")).decode(), "Name: B"))
+
+    assert collect_garbage(writer.directory, {kept}, grace=-1) == [orphan]
+    assert set(os.listdir(writer.directory)) == {INDEX_DIR, kept}
+    assert asyncio.run(writer.lookup("Name: B")) is None
+
+
+def test_variants_are_written(tmp_path):
+    writer = ThumbnailWriter(str(tmp_path), sizes=[4], formats=["webp", "nope"])
+    assert writer.formats == ["webp"]
+
+    fname = asyncio.run(writer.write(base64.b64encode(encode("JPEG")).decode()))
+    variants = list_variants(writer.directory, fname, (4,), ("webp", "nope"))
+    assert [(size, fmt) for _, size, fmt in variants] == [(4, "webp")]
+    with Image.open(os.path.join(writer.directory, variants[0][0])) as img:
+        assert img.size == (4, 4)
+
+    assert collect_garbage(writer.directory, {fname}, grace=-1) == []
+
+
+def test_variants_written_after_listing(tmp_path):
+    bare = ThumbnailWriter(str(tmp_path))
+    fname = asyncio.run(bare.write(base64.b64encode(encode("JPEG")).decode()))
+    assert list_variants(bare.directory, fname, (4,), ("webp",)) == ()
+
+    writer = ThumbnailWriter(str(tmp_path), sizes=[4], formats=["webp"])
+    asyncio.run(writer.write(base64.b64encode(encode("JPEG")).decode()))
+    assert [(size, fmt) for _, size, fmt in list_variants(writer.directory, fname, (4,), ("webp",))] == [(4, "webp")]
+
+    variant = variant_name(fname, 4, "webp")
+    assert sorted(collect_garbage(writer.directory, set(), grace=-1)) == sorted([fname, variant])
+    assert list_variants(writer.directory, fname, (4,), ("webp",)) == ()
+
+
+def test_served_files(writer: ThumbnailWriter):
+    fname = asyncio.run(writer.write(base64.b64encode(encode("JPEG")).decode(), prompt="Name: A"))
+    with open(os.path.join(writer.directory, "logo.jpg"), "wb") as f:
+        f.write(encode("JPEG"))
+    client = TestClient(Starlette(routes=[Mount("/thumbnails", ThumbnailFiles(directory=writer.directory))]))
+
+    response = client.get(f"/thumbnails/{fname}")
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+
+    # Not named after its content, so it may change
+    response = client.get("/thumbnails/logo.jpg")
+    assert response.status_code == 200
+    assert "cache-control" not in response.headers
+
+    response = client.get(f"/thumbnails/{INDEX_DIR}/{os.listdir(os.path.join(writer.directory, INDEX_DIR))[0]}")
+    assert response.status_code == 404
+
+
+def test_concurrent_writes_of_one_image(tmp_path):
+    writer = ThumbnailWriter(str(tmp_path), executor=ThreadPoolExecutor(max_workers=8))
+    b64 = base64.b64encode(encode("JPEG")).decode()
+
+    async def run():
+        return await asyncio.gather(*[writer.write(b64, prompt="same prompt") for _ in range(32)])
+
+    assert len(set(asyncio.run(run()))) == 1
+    # Nothing left aside
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files if name.endswith(".tmp")]